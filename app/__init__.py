@@ -2,36 +2,60 @@
 Veda Conjoint Experiment Application
 Flask application factory with MongoDB integration
 """
+from contextlib import nullcontext
+from functools import lru_cache
+from threading import Lock, Thread
+from time import sleep
 from flask import Flask
-from flask_pymongo import PyMongo
 from pymongo import MongoClient
+import pymongo
 from urllib.parse import urlparse
-import time
+import logging
 import os
 
-mongo = PyMongo()
+logger = logging.getLogger(__name__)
 
-# Direct MongoDB client for operations outside request context
+# Single process-wide MongoDB client (and its connection pool), shared by
+# request handlers and startup code alike
 _direct_client = None
 _direct_db = None
 
+# Collection handles by name, bound to the current client
+_collections = {}
+
+# Startup tasks (attribute seeding, index creation) run on a background
+# thread per process and are retried every STARTUP_RETRY_SECONDS until they
+# succeed; each attempt first probes MongoDB with a short timeout
+STARTUP_RETRY_SECONDS = 30
+STARTUP_PROBE_TIMEOUT_SECONDS = 2
+_startup_done = False
+_startup_thread = None
+_startup_lock = Lock()
+_fork_hook_registered = False
+
+# Set after the first successful ping so the connection is logged once
+_connection_logged = False
+
 
 def get_db():
     """
     Get MongoDB database, works both in and out of request context.
-    Uses Flask-PyMongo's connection when available, falls back to direct client.
+    Returns None if no client has been configured.
     """
-    global _direct_client, _direct_db
-    
-    # Try Flask-PyMongo first (preferred in request context)
-    if mongo.db is not None:
-        return mongo.db
-    
-    # Fallback to direct client
-    if _direct_db is not None:
-        return _direct_db
-    
-    return None
+    return _direct_db
+
+
+def get_collection(name: str):
+    """
+    Get a cached collection handle from the shared database.
+    Returns None if no client has been configured.
+    """
+    collection = _collections.get(name)
+    if collection is None:
+        if _direct_db is None:
+            return None
+        collection = _collections[name] = _direct_db[name]
+    return collection
 
 
 def _extract_db_name(mongo_uri: str) -> str:
@@ -54,69 +78,118 @@ def _extract_db_name(mongo_uri: str) -> str:
         return 'veda_conjoint'
 
 
-def _connect_mongodb_with_retry(mongo_uri: str, db_name: str, max_retries: int = 3):
+@lru_cache(maxsize=4)
+def _describe_mongo_uri(mongo_uri: str) -> tuple:
     """
-    Connect to MongoDB with retry logic for Railway's internal network.
+    Return (db_name, masked_uri) for a MongoDB URI.
+    Cached per URI so repeated create_app calls skip the parsing.
+    """
+    # Mask credentials: keep only what follows the last '@'
+    _, at, host_part = mongo_uri.rpartition('@')
+    masked_uri = host_part if at else mongo_uri[:30]
+    return _extract_db_name(mongo_uri), masked_uri
+
+
+def _create_mongo_client(mongo_uri: str, db_name: str, pool_options: dict = None):
+    """
+    Create the shared MongoDB client without a blocking handshake.
+    With connect=False the pool connects on first use, not during worker boot;
+    from then on the background monitor keeps minPoolSize sockets open.
     """
     global _direct_client, _direct_db
     
-    for attempt in range(max_retries):
-        try:
-            # Create client with longer timeout for Railway's internal network
-            _direct_client = MongoClient(
-                mongo_uri,
-                serverSelectionTimeoutMS=10000,  # 10 seconds
-                connectTimeoutMS=10000,
-                socketTimeoutMS=30000
-            )
-            _direct_db = _direct_client[db_name]
-            
-            # Test connection
-            _direct_client.server_info()
-            print(f"✅ MongoDB connected to '{db_name}' (attempt {attempt + 1})")
-            return True
-            
-        except Exception as e:
-            print(f"⚠️ MongoDB connection attempt {attempt + 1}/{max_retries} failed: {e}")
-            if attempt < max_retries - 1:
-                time.sleep(2)  # Wait before retry
-            _direct_client = None
-            _direct_db = None
+    # Handles bound to a previous client must not be reused
+    _collections.clear()
     
-    return False
+    try:
+        # Longer timeouts for Railway's internal network
+        _direct_client = MongoClient(
+            mongo_uri,
+            connect=False,
+            serverSelectionTimeoutMS=10000,  # 10 seconds
+            connectTimeoutMS=10000,
+            socketTimeoutMS=30000,
+            **(pool_options or {})
+        )
+        _direct_db = _direct_client[db_name]
+    except Exception as e:
+        # Only configuration errors (bad URI/options) can surface here
+        logger.error("⚠️ Failed to create MongoDB client: %s", e)
+        _direct_client = None
+        _direct_db = None
+
+
+def ping_db(timeout: float = None) -> bool:
+    """
+    Readiness check: one round-trip to MongoDB.
+    timeout (seconds) overrides the client's timeouts for this check.
+    The first successful ping in this process is logged.
+    """
+    global _connection_logged
+    
+    if _direct_client is None:
+        return False
+    
+    try:
+        with pymongo.timeout(timeout) if timeout is not None else nullcontext():
+            _direct_client.admin.command('ping')
+    except Exception as e:
+        logger.warning("⚠️ MongoDB ping failed: %s", e)
+        return False
+    
+    if not _connection_logged:
+        logger.info("✅ MongoDB connected to '%s'", _direct_db.name)
+        _connection_logged = True
+    return True
 
 
 def create_app(config_name='default'):
     """Application factory pattern for Flask app creation."""
     global _direct_client, _direct_db
     
+    # Module loggers report at INFO unless the server configured logging
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO,
+                            format='[%(asctime)s] %(levelname)s in %(module)s: %(message)s')
+    
     app = Flask(__name__, 
                 template_folder='../templates',
                 static_folder='../static')
     
+    # Encode every JSON response with orjson (ObjectId/datetime handled natively)
+    from app.json import OrjsonProvider
+    app.json = OrjsonProvider(app)
+    
     # Load configuration
     from app.config import config
     app.config.from_object(config[config_name])
     
+    # Question lookups by id, built once rather than scanned per request
+    questions = app.config['CHAT_QUESTIONS']
+    app.config['CHAT_QUESTION_IDS'] = tuple(q['id'] for q in questions)
+    app.config['CHAT_QUESTION_BY_ID'] = {q['id']: q for q in questions}
+    
     # Get MongoDB URI
     mongo_uri = app.config.get('MONGO_URI', '')
     
     if mongo_uri:
-        # Mask password for logging
-        masked_uri = mongo_uri.split('@')[-1] if '@' in mongo_uri else mongo_uri[:30]
-        print(f"🔗 MongoDB URI: ...@{masked_uri}")
+        # Extract database name and a password-free URI for logging
+        db_name, masked_uri = _describe_mongo_uri(mongo_uri)
         
-        # Extract database name from URI
-        db_name = _extract_db_name(mongo_uri)
-        print(f"📦 Database name: {db_name}")
+        # Connection details are only logged in debug, keeping production boot quiet
+        if app.debug:
+            app.logger.info("🔗 MongoDB URI: ...@%s", masked_uri)
+            app.logger.info("📦 Database name: %s", db_name)
         
-        # Try to connect with retries
-        _connect_mongodb_with_retry(mongo_uri, db_name)
+        # Create the client; sockets are opened lazily on first use
+        _create_mongo_client(mongo_uri, db_name, {
+            'minPoolSize': app.config['MONGO_MIN_POOL_SIZE'],
+            'maxPoolSize': app.config['MONGO_MAX_POOL_SIZE'],
+            'waitQueueTimeoutMS': app.config['MONGO_WAIT_QUEUE_TIMEOUT_MS'],
+            'maxIdleTimeMS': app.config['MONGO_MAX_IDLE_TIME_MS']
+        })
     else:
-        print("⚠️ MONGO_URI not configured!")
-    
-    # Initialize Flask-PyMongo (for request context usage)
-    mongo.init_app(app)
+        app.logger.warning("⚠️ MONGO_URI not configured!")
     
     # Register blueprints
     from app.routes.api import api_bp
@@ -125,22 +198,59 @@ def create_app(config_name='default'):
     app.register_blueprint(api_bp, url_prefix='/api')
     app.register_blueprint(views_bp)
     
-    # Initialize default job attributes using direct connection
-    if _direct_db is not None:
-        try:
-            existing_count = _direct_db.job_attributes.count_documents({})
-            if existing_count == 0:
-                from app.models.job_attribute import DEFAULT_JOB_ATTRIBUTES
-                for attr_data in DEFAULT_JOB_ATTRIBUTES:
-                    _direct_db.job_attributes.insert_one({
-                        'attribute_key': attr_data['attribute_key'],
-                        'display_name': attr_data['display_name'],
-                        'levels': attr_data['levels']
-                    })
-                print(f"✓ Seeded {len(DEFAULT_JOB_ATTRIBUTES)} default job attributes")
-            else:
-                print(f"✓ Found {existing_count} existing job attributes")
-        except Exception as e:
-            print(f"⚠️ Failed to initialize attributes: {e}")
+    # Seed attributes and build indexes in the background, never on a request
+    _start_startup_tasks()
     
     return app
+
+
+def _start_startup_tasks():
+    """
+    Start the startup-task thread for this process, unless the tasks already
+    succeeded or the thread is running. Forked workers (e.g. gunicorn started
+    from run.py) do not inherit the thread, so they start their own.
+    """
+    global _startup_thread, _fork_hook_registered
+    
+    if _direct_client is None:
+        return
+    
+    with _startup_lock:
+        if not _fork_hook_registered:
+            os.register_at_fork(after_in_child=_start_startup_tasks)
+            _fork_hook_registered = True
+        
+        if _startup_done or (_startup_thread is not None and _startup_thread.is_alive()):
+            return
+        _startup_thread = Thread(target=_run_startup_tasks, name='startup-tasks', daemon=True)
+        _startup_thread.start()
+
+
+def _run_startup_tasks():
+    """
+    Seed default attributes and build indexes, retrying every
+    STARTUP_RETRY_SECONDS until both succeed (e.g. MongoDB was unreachable
+    at boot). Each attempt starts with a short ping, so an unreachable server
+    costs one probe rather than a server-selection timeout per task.
+    """
+    global _startup_done
+    
+    from app.services.attribute_service import AttributeService
+    from app.models import ensure_all_indexes
+    
+    while True:
+        if ping_db(timeout=STARTUP_PROBE_TIMEOUT_SECONDS):
+            try:
+                seeded = AttributeService.ensure_initialized()
+            except Exception as e:
+                logger.error("✗ Attribute initialization failed: %s", e)
+                seeded = False
+            
+            # Index creation is skipped while seeding fails, as it would
+            # only time out once per collection as well
+            if seeded and ensure_all_indexes():
+                _startup_done = True
+                return
+        
+        logger.error("✗ Startup tasks incomplete; retrying in %ss", STARTUP_RETRY_SECONDS)
+        sleep(STARTUP_RETRY_SECONDS)
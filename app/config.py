@@ -2,9 +2,84 @@
 Configuration classes for different environments
 """
 import os
-from dotenv import load_dotenv
+from types import MappingProxyType
+from dotenv import dotenv_values, find_dotenv
 
-load_dotenv()
+
+def _load_dotenv():
+    """Populate os.environ from .env without overriding existing variables."""
+    path = find_dotenv()
+    if not path:
+        return
+    for key, value in dotenv_values(path).items():
+        if value is not None:
+            os.environ.setdefault(key, value)
+
+
+_load_dotenv()
+
+
+# Chat flow questions - built once and shared read-only by every config class
+CHAT_QUESTIONS = tuple(MappingProxyType(question) for question in [
+    {
+        'id': 'welcome',
+        'type': 'info',
+        'message': "Hi! I'm Jill, the AI assistant for Veda. I'll ask you a few quick questions about the kind of roles and employers you're looking for, which should take about three minutes. Based on your answers, I'll be able to help identify roles that will be well suited to what you are looking for. Let's get started."
+    },
+    {
+        'id': 'email',
+        'type': 'text',
+        'message': "Please confirm your email address.",
+        'placeholder': 'Enter your email address'
+    },
+    {
+        'id': 'name',
+        'type': 'text',
+        'message': "Great! What's your name?",
+        'placeholder': 'Enter your full name'
+    },
+    {
+        'id': 'zip_code',
+        'type': 'text',
+        'message': "And your ZIP code?",
+        'placeholder': 'Enter your ZIP code'
+    },
+    {
+        'id': 'position_type',
+        'type': 'text',
+        'message': "What kind of position are you looking for? (e.g. Marketing Manager in tech)",
+        'placeholder': 'Describe the position you\'re seeking'
+    },
+    {
+        'id': 'work_preference',
+        'type': 'choice',
+        'message': "How would you ideally like to work?",
+        'options': (
+            {'value': 'remote', 'label': 'Remote'},
+            {'value': 'hybrid', 'label': 'Hybrid'},
+            {'value': 'in_person', 'label': 'In-person'},
+            {'value': 'no_preference', 'label': 'No strong preference'}
+        )
+    },
+    {
+        'id': 'salary_range',
+        'type': 'choice',
+        'message': "What salary range are you targeting?",
+        'options': (
+            {'value': 'below_50k', 'label': 'Below $50,000'},
+            {'value': '50k_75k', 'label': '$50,000 - $75,000'},
+            {'value': '75k_100k', 'label': '$75,000 - $100,000'},
+            {'value': '100k_150k', 'label': '$100,000 - $150,000'},
+            {'value': 'above_150k', 'label': '$150,000+'},
+            {'value': 'flexible', 'label': "I'm flexible"}
+        )
+    },
+    {
+        'id': 'conjoint',
+        'type': 'conjoint',
+        'message': "Now I'd like to understand your job preferences better. Which company would you be more likely to apply to?"
+    }
+])
 
 
 class Config:
@@ -12,75 +87,30 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'jack-and-jill-secret-key-2024'
     MONGO_URI = os.environ.get('MONGO_URI') or 'mongodb://localhost:27017/jack_and_jill_conjoint'
     
+    # MongoDB connection pool - keep warm sockets so early requests skip connection setup
+    MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE') or 10)
+    MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE') or 50)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS') or 2000)
+    # Sockets above minPoolSize idle this long are closed (surges shrink back)
+    MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS') or 60000)
+    
     # Conjoint experiment settings
     CONJOINT_ROUNDS = 5  # Number of A/B comparisons per session (3-5 per participant)
+    # Generate the later rounds' cards in the background once a session
+    # reaches the conjoint step (CONJOINT_PREGENERATE=false disables it)
+    CONJOINT_PREGENERATE = (os.environ.get('CONJOINT_PREGENERATE') or 'true').lower() in ('1', 'true', 'yes')
     SESSION_TIMEOUT_MINUTES = 60
     
+    # Fraction of unhandled API errors logged with a traceback outside debug;
+    # the first error of each type is always logged
+    ERROR_LOG_SAMPLE_RATE = float(os.environ.get('ERROR_LOG_SAMPLE_RATE') or 1.0)
+    
     # Customizable branding
     ASSISTANT_NAME = os.environ.get('ASSISTANT_NAME') or 'Jill'
     COMPANY_NAME = os.environ.get('COMPANY_NAME') or 'Veda-'
     
-    # Chat flow settings
-    CHAT_QUESTIONS = [
-        {
-            'id': 'welcome',
-            'type': 'info',
-            'message': "Hi! I'm Jill, the AI assistant for Veda. I'll ask you a few quick questions about the kind of roles and employers you're looking for, which should take about three minutes. Based on your answers, I'll be able to help identify roles that will be well suited to what you are looking for. Let's get started."
-        },
-        {
-            'id': 'email',
-            'type': 'text',
-            'message': "Please confirm your email address.",
-            'placeholder': 'Enter your email address'
-        },
-        {
-            'id': 'name',
-            'type': 'text',
-            'message': "Great! What's your name?",
-            'placeholder': 'Enter your full name'
-        },
-        {
-            'id': 'zip_code',
-            'type': 'text',
-            'message': "And your ZIP code?",
-            'placeholder': 'Enter your ZIP code'
-        },
-        {
-            'id': 'position_type',
-            'type': 'text',
-            'message': "What kind of position are you looking for? (e.g. Marketing Manager in tech)",
-            'placeholder': 'Describe the position you\'re seeking'
-        },
-        {
-            'id': 'work_preference',
-            'type': 'choice',
-            'message': "How would you ideally like to work?",
-            'options': [
-                {'value': 'remote', 'label': 'Remote'},
-                {'value': 'hybrid', 'label': 'Hybrid'},
-                {'value': 'in_person', 'label': 'In-person'},
-                {'value': 'no_preference', 'label': 'No strong preference'}
-            ]
-        },
-        {
-            'id': 'salary_range',
-            'type': 'choice',
-            'message': "What salary range are you targeting?",
-            'options': [
-                {'value': 'below_50k', 'label': 'Below $50,000'},
-                {'value': '50k_75k', 'label': '$50,000 - $75,000'},
-                {'value': '75k_100k', 'label': '$75,000 - $100,000'},
-                {'value': '100k_150k', 'label': '$100,000 - $150,000'},
-                {'value': 'above_150k', 'label': '$150,000+'},
-                {'value': 'flexible', 'label': "I'm flexible"}
-            ]
-        },
-        {
-            'id': 'conjoint',
-            'type': 'conjoint',
-            'message': "Now I'd like to understand your job preferences better. Which company would you be more likely to apply to?"
-        }
-    ]
+    # Chat flow settings (shared, read-only)
+    CHAT_QUESTIONS = CHAT_QUESTIONS
 
 
 class DevelopmentConfig(Config):
@@ -93,6 +123,8 @@ class ProductionConfig(Config):
     """Production configuration."""
     DEBUG = False
     TESTING = False
+    # Repeats of an error type are sampled so an error storm cannot flood the logs
+    ERROR_LOG_SAMPLE_RATE = float(os.environ.get('ERROR_LOG_SAMPLE_RATE') or 0.01)
 
 
 class TestingConfig(Config):
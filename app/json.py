@@ -0,0 +1,62 @@
+"""
+JSON Serialization - orjson-backed encoding for API responses
+Handles MongoDB types (ObjectId, datetime) natively
+"""
+from collections.abc import Iterator, Mapping
+from bson import ObjectId
+from flask import Response
+from flask.json.provider import JSONProvider
+import orjson
+
+# Stored datetimes are naive UTC and are emitted without an offset, exactly
+# as datetime.isoformat() wrote them before (exports and clients rely on it)
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    """Serialize types orjson does not handle natively."""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj, indent: bool = False) -> bytes:
+    """Serialize obj to JSON bytes, optionally indented by two spaces."""
+    option = _OPTIONS | orjson.OPT_INDENT_2 if indent else _OPTIONS
+    return orjson.dumps(obj, default=_default, option=option)
+
+
+def iter_object(items) -> Iterator[bytes]:
+    """
+    Encode (key, value) pairs as one JSON object, chunk by chunk, so a
+    large mapping can be streamed without building it first.
+    """
+    separator = b'{'
+    for key, value in items:
+        yield separator + dumps(key) + b':' + dumps(value)
+        separator = b','
+    yield b'{}' if separator == b'{' else b'}'
+
+
+def json_response(obj, status: int = 200) -> Response:
+    """Create a JSON Flask Response without going through jsonify."""
+    return Response(dumps(obj), status=status, mimetype='application/json')
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    Flask JSON provider backed by orjson, so jsonify() and request.get_json()
+    share the same encoder as json_response().
+    """
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return dumps(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype='application/json')
@@ -1,12 +1,22 @@
 """
 MongoDB Models Package
 """
-from app.models.user import User
-from app.models.chat_session import ChatSession
-from app.models.user_response import UserResponse
-from app.models.job_attribute import JobAttribute
-from app.models.generated_job_card import GeneratedJobCard
-from app.models.conjoint_choice import ConjointChoice
+import logging
+from importlib import import_module
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Models are imported on first attribute access (PEP 562), so importing one
+# model module does not pull in all the others
+_lazy_models = {
+    'User': 'app.models.user',
+    'ChatSession': 'app.models.chat_session',
+    'UserResponse': 'app.models.user_response',
+    'JobAttribute': 'app.models.job_attribute',
+    'GeneratedJobCard': 'app.models.generated_job_card',
+    'ConjointChoice': 'app.models.conjoint_choice'
+}
 
 __all__ = [
     'User',
@@ -14,5 +24,45 @@ __all__ = [
     'UserResponse',
     'JobAttribute',
     'GeneratedJobCard',
-    'ConjointChoice'
+    'ConjointChoice',
+    'ensure_all_indexes'
 ]
+
+
+def __getattr__(name):
+    """Import a model class on first access and cache it on the package."""
+    module_name = _lazy_models.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy_models))
+
+
+def ensure_all_indexes() -> bool:
+    """
+    Create the declared indexes for every collection.
+    Each model builds its indexes once per process; failures are logged per
+    collection and only the failed ones are retried on the next call.
+    Returns True once every collection's indexes are in place.
+    """
+    ready = True
+    for name in _lazy_models:
+        model = __getattr__(name)
+        try:
+            model.ensure_indexes()
+        except DuplicateKeyError as e:
+            ready = False
+            logger.error(
+                "✗ Unique index on '%s' blocked by duplicate documents; "
+                "remove the duplicates so it can build: %s",
+                model.collection_name, e
+            )
+        except Exception as e:
+            ready = False
+            logger.error("✗ Failed to create indexes for '%s': %s", model.collection_name, e)
+    return ready
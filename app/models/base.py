@@ -5,7 +5,40 @@ Implements Template Method pattern for CRUD operations
 from abc import ABC, abstractmethod
 from datetime import datetime
 from bson import ObjectId
-from app import mongo, get_db
+from app import _collections, get_collection
+
+# Models whose indexes have been created in this process
+_indexes_ready = set()
+
+
+def as_object_id(value) -> ObjectId:
+    """Return value as an ObjectId, skipping re-validation if it already is one."""
+    return value if isinstance(value, ObjectId) else ObjectId(value)
+
+
+class _CollectionAccessor:
+    """
+    Descriptor returning the model's MongoDB collection with connection
+    validation. Works on both the class and its instances.
+    """
+    
+    def __get__(self, instance, owner):
+        # Hot path: a single dict lookup once the handle has been cached
+        try:
+            return _collections[owner.collection_name]
+        except KeyError:
+            return self._resolve(owner)
+    
+    @staticmethod
+    def _resolve(owner):
+        """Slow path: bind and cache the handle, validating the connection."""
+        collection = get_collection(owner.collection_name)
+        if collection is None:
+            raise RuntimeError(
+                f"MongoDB database not connected. "
+                f"Cannot access collection '{owner.collection_name}'"
+            )
+        return collection
 
 
 class BaseModel(ABC):
@@ -14,38 +47,25 @@ class BaseModel(ABC):
     Provides common CRUD operations for all MongoDB collections.
     """
     
+    # Empty so subclasses that declare __slots__ carry no per-instance __dict__
+    __slots__ = ()
+    
+    # IndexModel specs for the collection, created once at startup
+    indexes = []
+    
     @property
     @abstractmethod
     def collection_name(self) -> str:
         """Return the MongoDB collection name."""
         pass
     
-    @property
-    def collection(self):
-        """
-        Get the MongoDB collection with connection validation.
-        Uses get_db() which works both in and out of request context.
-        """
-        db = get_db()
-        if db is None:
-            raise RuntimeError(
-                f"MongoDB database not connected. "
-                f"Cannot access collection '{self.collection_name}'"
-            )
-        return db[self.collection_name]
+    # Resolves from the class or an instance, so classmethods need no instance
+    collection = _CollectionAccessor()
     
+    @abstractmethod
     def to_dict(self) -> dict:
         """Convert model to dictionary for MongoDB insertion."""
-        data = {}
-        for key, value in self.__dict__.items():
-            if not key.startswith('_'):
-                if isinstance(value, datetime):
-                    data[key] = value
-                elif isinstance(value, ObjectId):
-                    data[key] = value
-                else:
-                    data[key] = value
-        return data
+        pass
     
     @classmethod
     def from_dict(cls, data: dict):
@@ -53,45 +73,109 @@ class BaseModel(ABC):
         if data is None:
             return None
         instance = cls.__new__(cls)
+        
+        if hasattr(instance, '__dict__'):
+            for key, value in data.items():
+                setattr(instance, key if key != '_id' else 'id', value)
+            instance._loaded()
+            return instance
+        
+        # Slotted models: fields missing from the document (e.g. projected
+        # away) read as None, and keys without a slot or property are dropped
+        slots = cls.__slots__
+        for name in slots:
+            setattr(instance, name, None)
         for key, value in data.items():
-            setattr(instance, key if key != '_id' else 'id', value)
+            key = key if key != '_id' else 'id'
+            if key in slots or isinstance(vars(cls).get(key), property):
+                setattr(instance, key, value)
+        instance._loaded()
         return instance
     
+    def _loaded(self):
+        """Hook run after from_dict populates an instance. Override as needed."""
+        pass
+    
     def save(self) -> ObjectId:
         """Save model to MongoDB. Template method."""
         data = self.to_dict()
-        data['created_at'] = datetime.utcnow()
+        # Models that track created_at themselves keep their own timestamp
+        data.setdefault('created_at', datetime.utcnow())
         result = self.collection.insert_one(data)
         self.id = result.inserted_id
         return result.inserted_id
     
+    @classmethod
+    def save_many(cls, instances: list) -> list:
+        """Save several models of this type in a single insert_many round-trip."""
+        now = datetime.utcnow()
+        documents = []
+        for instance in instances:
+            data = instance.to_dict()
+            data.setdefault('created_at', now)
+            documents.append(data)
+        
+        result = cls.collection.insert_many(documents, ordered=False)
+        for instance, inserted_id in zip(instances, result.inserted_ids):
+            instance.id = inserted_id
+        return result.inserted_ids
+    
     @classmethod
     def find_by_id(cls, id: ObjectId):
         """Find document by ID."""
-        instance = cls.__new__(cls)
-        data = instance.collection.find_one({'_id': ObjectId(id)})
+        data = cls.collection.find_one({'_id': as_object_id(id)})
         return cls.from_dict(data)
     
     @classmethod
-    def find_one(cls, query: dict):
-        """Find single document matching query."""
-        instance = cls.__new__(cls)
-        data = instance.collection.find_one(query)
+    def find_one(cls, query: dict, projection: dict = None):
+        """
+        Find single document matching query.
+        Pass projection to fetch only the fields the caller needs.
+        """
+        data = cls.collection.find_one(query, projection)
         return cls.from_dict(data)
     
     @classmethod
-    def find_many(cls, query: dict, sort=None, limit=None):
-        """Find multiple documents matching query."""
-        instance = cls.__new__(cls)
-        cursor = instance.collection.find(query)
+    def find_many(cls, query: dict, sort=None, limit=None,
+                  projection: dict = None, as_iter: bool = False):
+        """
+        Find multiple documents matching query.
+        Pass projection to fetch only some fields, and as_iter=True to get a
+        lazy iterator instead of a list.
+        """
+        cursor = cls.collection.find(query, projection)
         if sort:
             cursor = cursor.sort(sort)
         if limit:
             cursor = cursor.limit(limit)
+        if as_iter:
+            return (cls.from_dict(doc) for doc in cursor)
         return [cls.from_dict(doc) for doc in cursor]
     
+    @classmethod
+    def ensure_indexes(cls):
+        """
+        Create all declared indexes for the collection in one round-trip.
+        Runs once per model per process; never called from the save() path.
+        """
+        if cls in _indexes_ready:
+            return
+        if cls.indexes:
+            cls.collection.create_indexes(cls.indexes)
+        _indexes_ready.add(cls)
+    
+    @classmethod
+    def indexes_ready(cls) -> bool:
+        """Whether ensure_indexes has built this model's indexes in this process."""
+        return cls in _indexes_ready
+    
     @classmethod
     def count(cls, query: dict = None) -> int:
-        """Count documents matching query."""
-        instance = cls.__new__(cls)
-        return instance.collection.count_documents(query or {})
+        """
+        Count documents matching query.
+        Without a query, the count is read from collection metadata instead
+        of scanning the collection.
+        """
+        if not query:
+            return cls.collection.estimated_document_count()
+        return cls.collection.count_documents(query)
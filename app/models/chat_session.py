@@ -4,11 +4,12 @@ ChatSession Model - Represents a single chatbot/form interaction
 from datetime import datetime
 from enum import Enum
 from bson import ObjectId
-from app.models.base import BaseModel
+from pymongo import IndexModel, ReturnDocument
+from app.models.base import BaseModel, as_object_id
 
 
-class SessionStatus(Enum):
-    """Session status enumeration."""
+class SessionStatus(str, Enum):
+    """Session status enumeration (members compare equal to stored strings)."""
     STARTED = 'started'
     COMPLETED = 'completed'
     ABANDONED = 'abandoned'
@@ -30,6 +31,17 @@ class ChatSession(BaseModel):
     
     collection_name = 'chat_sessions'
     
+    # Fixed field set; created_at is stamped by BaseModel.save()
+    __slots__ = ('user_id', 'session_seed', 'status', 'started_at', 'completed_at',
+                 'current_step', 'current_round', 'created_at', 'id')
+    
+    indexes = [
+        IndexModel('user_id'),
+        IndexModel([('user_id', 1), ('status', 1)]),
+        # Experiment-wide completed-session count (summary statistics)
+        IndexModel('status')
+    ]
+    
     def __init__(self, user_id: ObjectId = None, session_seed: str = None):
         self.user_id = user_id
         self.session_seed = session_seed
@@ -43,60 +55,175 @@ class ChatSession(BaseModel):
     @classmethod
     def find_by_user(cls, user_id: ObjectId, status: str = None):
         """Find sessions by user ID."""
-        query = {'user_id': ObjectId(user_id)}
+        query = {'user_id': as_object_id(user_id)}
         if status:
             query['status'] = status
         return cls.find_many(query, sort=[('started_at', -1)])
     
+    @classmethod
+    def find_with_round_cards(cls, session_id: ObjectId, round_number: int):
+        """
+        Load a session together with its cards for one round, in a single
+        aggregation. Returns (session, [GeneratedJobCard, ...]), or
+        (None, []) if the session does not exist.
+        """
+        from app.models.generated_job_card import GeneratedJobCard
+        
+        session_id = as_object_id(session_id)
+        pipeline = [
+            {'$match': {'_id': session_id}},
+            {'$lookup': {
+                'from': GeneratedJobCard.collection_name,
+                'pipeline': [
+                    {'$match': {'session_id': session_id, 'round_number': round_number}}
+                ],
+                'as': 'cards'
+            }}
+        ]
+        
+        doc = next(cls.collection.aggregate(pipeline), None)
+        if doc is None:
+            return None, []
+        cards = [GeneratedJobCard.from_dict(card) for card in doc.pop('cards')]
+        return cls.from_dict(doc), cards
+    
+    @classmethod
+    def load_full_state(cls, session_id: ObjectId):
+        """
+        Load a session with its user and its responses in one aggregation.
+        Returns (session, user or None, [response docs in answer order]),
+        or None if the session does not exist. Response docs carry only
+        question_id and normalized_value.
+        """
+        from app.models.user import User
+        from app.models.user_response import UserResponse
+        
+        session_id = as_object_id(session_id)
+        pipeline = [
+            {'$match': {'_id': session_id}},
+            {'$lookup': {
+                'from': User.collection_name,
+                'localField': 'user_id',
+                'foreignField': '_id',
+                'as': 'user'
+            }},
+            {'$lookup': {
+                'from': UserResponse.collection_name,
+                'pipeline': [
+                    {'$match': {'session_id': session_id}},
+                    {'$sort': {'timestamp': 1}},
+                    {'$project': {'_id': 0, 'question_id': 1, 'normalized_value': 1}}
+                ],
+                'as': 'responses'
+            }}
+        ]
+        
+        doc = next(cls.collection.aggregate(pipeline), None)
+        if doc is None:
+            return None
+        users = doc.pop('user')
+        responses = doc.pop('responses')
+        user = User.from_dict(users[0]) if users else None
+        return cls.from_dict(doc), user, responses
+    
     @classmethod
     def get_active_session(cls, user_id: ObjectId):
         """Get user's active (started) session."""
         return cls.find_one({
-            'user_id': ObjectId(user_id),
+            'user_id': as_object_id(user_id),
             'status': SessionStatus.STARTED.value
         })
     
+    def _patch(self, **fields):
+        """Apply field changes locally and persist them in a single write."""
+        for key, value in fields.items():
+            setattr(self, key, value)
+        self.collection.update_one({'_id': self.id}, {'$set': fields})
+    
     def complete(self):
         """Mark session as completed."""
-        self.status = SessionStatus.COMPLETED.value
-        self.completed_at = datetime.utcnow()
-        self.collection.update_one(
-            {'_id': self.id},
-            {'$set': {
-                'status': self.status,
-                'completed_at': self.completed_at
-            }}
+        self._patch(
+            status=SessionStatus.COMPLETED.value,
+            completed_at=datetime.utcnow()
         )
     
     def abandon(self):
         """Mark session as abandoned."""
-        self.status = SessionStatus.ABANDONED.value
-        self.collection.update_one(
-            {'_id': self.id},
-            {'$set': {'status': self.status}}
-        )
+        self._patch(status=SessionStatus.ABANDONED.value)
     
-    def update_progress(self, step: str, round_number: int = None):
-        """Update session progress."""
-        update = {'current_step': step}
-        if round_number is not None:
-            update['current_round'] = round_number
+    @classmethod
+    def advance(cls, session_id: ObjectId, steps: tuple, total_rounds: int):
+        """
+        Move a session to its next step in one atomic findOneAndUpdate and
+        return the updated session (None if not found or on an unknown step).
         
-        self.current_step = step
-        if round_number is not None:
-            self.current_round = round_number
-            
-        self.collection.update_one(
-            {'_id': self.id},
-            {'$set': update}
+        The transition is evaluated server-side against the stored state:
+        conjoint rounds advance until total_rounds, then the next step in
+        steps is entered (round 1 for conjoint, otherwise 0); advancing past
+        the last step completes the session.
+        """
+        steps = list(steps)
+        stay = {'$and': [
+            {'$eq': ['$current_step', 'conjoint']},
+            {'$lt': ['$current_round', total_rounds]}
+        ]}
+        done = {'$and': [
+            {'$eq': ['$current_step', steps[-1]]},
+            {'$or': [
+                {'$ne': ['$current_step', 'conjoint']},
+                {'$gte': ['$current_round', total_rounds]}
+            ]}
+        ]}
+        next_step = {'$switch': {
+            'branches': [
+                {'case': {'$eq': ['$current_step', step]}, 'then': following}
+                for step, following in zip(steps, steps[1:])
+            ],
+            'default': '$current_step'
+        }}
+        
+        pipeline = [
+            {'$set': {'_stay': stay, '_done': done, '_next': next_step}},
+            {'$set': {
+                'current_step': {'$cond': [
+                    {'$or': ['$_stay', '$_done']}, '$current_step', '$_next'
+                ]},
+                'current_round': {'$switch': {
+                    'branches': [
+                        {'case': '$_stay', 'then': {'$add': ['$current_round', 1]}},
+                        {'case': '$_done', 'then': '$current_round'},
+                        {'case': {'$eq': ['$_next', 'conjoint']}, 'then': 1}
+                    ],
+                    'default': 0
+                }},
+                'status': {'$cond': [
+                    '$_done', SessionStatus.COMPLETED.value, '$status'
+                ]},
+                'completed_at': {'$cond': [
+                    '$_done', {'$literal': datetime.utcnow()}, '$completed_at'
+                ]}
+            }},
+            {'$project': {'_stay': 0, '_done': 0, '_next': 0}}
+        ]
+        
+        data = cls.collection.find_one_and_update(
+            {'_id': as_object_id(session_id), 'current_step': {'$in': steps}},
+            pipeline,
+            return_document=ReturnDocument.AFTER
         )
+        return cls.from_dict(data) if data else None
     
     @classmethod
-    def ensure_indexes(cls):
-        """Create indexes for the collection."""
-        instance = cls.__new__(cls)
-        instance.collection.create_index('user_id')
-        instance.collection.create_index([('user_id', 1), ('status', 1)])
+    def set_progress(cls, session_id: ObjectId, step: str, round_number: int = None) -> bool:
+        """
+        Update a session's progress by id, without loading it first.
+        Returns False if no session has that id.
+        """
+        fields = {'current_step': step}
+        if round_number is not None:
+            fields['current_round'] = round_number
+        result = cls.collection.update_one({'_id': as_object_id(session_id)}, {'$set': fields})
+        return result.matched_count > 0
     
     def to_dict(self) -> dict:
         """Convert to dictionary."""
@@ -111,14 +238,14 @@ class ChatSession(BaseModel):
         }
     
     def to_json(self) -> dict:
-        """Convert to JSON-serializable dictionary."""
+        """Convert to dictionary for JSON responses (encoded by app.json)."""
         return {
-            'id': str(self.id) if self.id else None,
-            'user_id': str(self.user_id) if self.user_id else None,
+            'id': self.id,
+            'user_id': self.user_id,
             'session_seed': self.session_seed,
             'status': self.status,
-            'started_at': self.started_at.isoformat() if self.started_at else None,
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'started_at': self.started_at,
+            'completed_at': self.completed_at,
             'current_step': self.current_step,
             'current_round': self.current_round
         }
@@ -4,7 +4,8 @@ Core dataset for analysis - No updates allowed
 """
 from datetime import datetime
 from bson import ObjectId
-from app.models.base import BaseModel
+from pymongo import IndexModel
+from app.models.base import BaseModel, as_object_id
 
 
 class ConjointChoice(BaseModel):
@@ -24,6 +25,22 @@ class ConjointChoice(BaseModel):
     
     collection_name = 'conjoint_choices'
     
+    # Fixed field set; created_at is stamped by BaseModel.save()
+    __slots__ = ('session_id', 'round_number', 'choice', 'response_time_ms',
+                 'timestamp', 'created_at', 'id')
+    
+    # The compound index also serves session_id-only queries (prefix); being
+    # unique, it enforces one choice per round even under concurrent submits
+    indexes = [
+        IndexModel([('session_id', 1), ('round_number', 1)], unique=True)
+    ]
+    
+    # Fields read by the joined (choice + cards) export rows
+    _ROW_PROJECTION = {
+        '_id': 0, 'session_id': 1, 'round_number': 1, 'choice': 1,
+        'response_time_ms': 1, 'timestamp': 1
+    }
+    
     def __init__(self, session_id: ObjectId, round_number: int,
                  choice: str, response_time_ms: int):
         self.session_id = session_id
@@ -34,54 +51,98 @@ class ConjointChoice(BaseModel):
         self.id = None
     
     @classmethod
-    def find_by_session(cls, session_id: ObjectId):
+    def find_by_session(cls, session_id: ObjectId, projection: dict = None,
+                        as_iter: bool = False):
         """Find all choices for a session."""
         return cls.find_many(
-            {'session_id': ObjectId(session_id)},
-            sort=[('round_number', 1)]
+            {'session_id': as_object_id(session_id)},
+            sort=[('round_number', 1)],
+            projection=projection,
+            as_iter=as_iter
         )
     
     @classmethod
     def get_choice(cls, session_id: ObjectId, round_number: int):
         """Get choice for a specific round."""
         return cls.find_one({
-            'session_id': ObjectId(session_id),
+            'session_id': as_object_id(session_id),
             'round_number': round_number
         })
     
     @classmethod
     def get_all_choices_with_cards(cls, session_id: ObjectId):
         """
-        Get all choices with their associated job cards.
+        Yield all choices with their associated job cards, one row at a time.
         Useful for analysis export.
+        
+        Cards are joined server-side with $lookup, so rows stream straight
+        from a single aggregation cursor without building a list.
         """
         from app.models.generated_job_card import GeneratedJobCard
         
-        choices = cls.find_by_session(session_id)
-        result = []
+        session_id = as_object_id(session_id)
+        pipeline = [
+            {'$match': {'session_id': session_id}},
+            {'$sort': {'round_number': 1}},
+            {'$project': cls._ROW_PROJECTION},
+            {'$lookup': {
+                'from': GeneratedJobCard.collection_name,
+                'let': {'round_number': '$round_number'},
+                'pipeline': [
+                    {'$match': {
+                        'session_id': session_id,
+                        '$expr': {'$eq': ['$round_number', '$$round_number']}
+                    }},
+                    {'$project': {'_id': 0, 'card_label': 1, 'attributes': 1}}
+                ],
+                'as': 'cards'
+            }}
+        ]
         
-        for choice in choices:
-            cards = GeneratedJobCard.find_by_round(session_id, choice.round_number)
-            card_a = next((c for c in cards if c.card_label == 'A'), None)
-            card_b = next((c for c in cards if c.card_label == 'B'), None)
+        for doc in cls.collection.aggregate(pipeline):
+            cards = {card['card_label']: card['attributes'] for card in doc['cards']}
             
-            result.append({
-                'round_number': choice.round_number,
-                'choice': choice.choice,
-                'response_time_ms': choice.response_time_ms,
-                'card_a_attributes': card_a.attributes if card_a else None,
-                'card_b_attributes': card_b.attributes if card_b else None,
-                'timestamp': choice.timestamp
-            })
-        
-        return result
+            yield {
+                'round_number': doc['round_number'],
+                'choice': doc['choice'],
+                'response_time_ms': doc['response_time_ms'],
+                'card_a_attributes': cards.get('A'),
+                'card_b_attributes': cards.get('B'),
+                'timestamp': doc['timestamp']
+            }
     
     @classmethod
-    def ensure_indexes(cls):
-        """Create indexes for the collection."""
-        instance = cls.__new__(cls)
-        instance.collection.create_index('session_id')
-        instance.collection.create_index([('session_id', 1), ('round_number', 1)])
+    def iter_choices_with_cards(cls, session_ids: list = None, batch_size: int = 1000):
+        """
+        Yield raw choice documents, each with a 'cards' list holding the
+        card_label and attributes of that round's cards.
+        All sessions (or only session_ids) are joined server-side in one
+        $lookup, instead of one card query per choice. Exports read every
+        row, so the cursor fetches large batches (fewer getMore round-trips).
+        """
+        from app.models.generated_job_card import GeneratedJobCard
+        
+        query = {}
+        if session_ids:
+            query['session_id'] = {'$in': [as_object_id(sid) for sid in session_ids]}
+        
+        pipeline = [
+            {'$match': query},
+            {'$project': cls._ROW_PROJECTION},
+            {'$lookup': {
+                'from': GeneratedJobCard.collection_name,
+                'let': {'session_id': '$session_id', 'round_number': '$round_number'},
+                'pipeline': [
+                    {'$match': {'$expr': {'$and': [
+                        {'$eq': ['$session_id', '$$session_id']},
+                        {'$eq': ['$round_number', '$$round_number']}
+                    ]}}},
+                    {'$project': {'_id': 0, 'card_label': 1, 'attributes': 1}}
+                ],
+                'as': 'cards'
+            }}
+        ]
+        return cls.collection.aggregate(pipeline, batchSize=batch_size)
     
     def to_dict(self) -> dict:
         """Convert to dictionary."""
@@ -94,12 +155,12 @@ class ConjointChoice(BaseModel):
         }
     
     def to_json(self) -> dict:
-        """Convert to JSON-serializable dictionary."""
+        """Convert to dictionary for JSON responses (encoded by app.json)."""
         return {
-            'id': str(self.id) if self.id else None,
-            'session_id': str(self.session_id) if self.session_id else None,
+            'id': self.id,
+            'session_id': self.session_id,
             'round_number': self.round_number,
             'choice': self.choice,
             'response_time_ms': self.response_time_ms,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None
+            'timestamp': self.timestamp
         }
@@ -1,14 +1,17 @@
 """
 GeneratedJobCard Model - Stores generated schematic job ads shown to users
 """
+import sys
 from datetime import datetime
 from enum import Enum
 from bson import ObjectId
-from app.models.base import BaseModel
+from pymongo import IndexModel
+from pymongo.errors import BulkWriteError
+from app.models.base import BaseModel, as_object_id
 
 
-class CardLabel(Enum):
-    """Card label enumeration."""
+class CardLabel(str, Enum):
+    """Card label enumeration (members compare equal to stored strings)."""
     A = 'A'
     B = 'B'
 
@@ -22,29 +25,83 @@ class GeneratedJobCard(BaseModel):
         - card_label (enum: A | B)
         - attributes (object: attribute_key → level_id)
         - rendered_text (string)
+        - rendered_html (string) - display markup, computed once at creation
         - round_number (number)
+        - shown_at (date) - when the card was first served; None for cards
+          pre-generated for a round the participant has not reached
     
-    Note: Stored to ensure exact exposure tracking
+    Note: Stored to ensure exact exposure tracking (cards with shown_at set)
           Generated using session_seed for reproducibility
     """
     
     collection_name = 'generated_job_cards'
     
+    # Fixed field set; created_at is stamped by BaseModel.save()
+    __slots__ = ('session_id', 'card_label', 'attributes', 'rendered_text',
+                 'rendered_html', 'round_number', 'shown_at', 'created_at', 'id')
+    
+    # Covers session_id and (session_id, round_number) lookups as prefixes,
+    # and find_by_session's round/label sort. Unique, so pre-generation and
+    # on-demand generation can never both store a round's cards
+    indexes = [
+        IndexModel([('session_id', 1), ('round_number', 1), ('card_label', 1)],
+                   unique=True)
+    ]
+    
     def __init__(self, session_id: ObjectId, card_label: str, 
                  attributes: dict, rendered_text: str, round_number: int):
         self.session_id = session_id
         self.card_label = card_label
         self.attributes = attributes  # {attribute_key: level_id, ...}
         self.rendered_text = rendered_text
+        self.rendered_html = None  # Set by JobCardFactory before saving
         self.round_number = round_number
+        self.shown_at = None
         self.created_at = datetime.utcnow()
         self.id = None
     
+    def _loaded(self):
+        # Attribute keys and level ids are a small fixed vocabulary; interning
+        # them lets lookups against JobAttribute definitions compare by identity
+        if self.attributes:
+            self.attributes = {
+                sys.intern(key): sys.intern(level_id)
+                for key, level_id in self.attributes.items()
+            }
+    
+    @classmethod
+    def save_new(cls, cards: list) -> bool:
+        """
+        Insert cards in one unordered insert_many; cards whose
+        (session_id, round_number, card_label) is already stored are skipped.
+        Returns True if every card was inserted.
+        """
+        try:
+            cls.save_many(cards)
+            return True
+        except BulkWriteError as e:
+            if any(error.get('code') != 11000 for error in e.details.get('writeErrors', ())):
+                raise
+            return False
+    
+    @classmethod
+    def mark_shown(cls, session_id: ObjectId, round_number: int):
+        """
+        Stamp shown_at on a round's pre-generated cards that have not been
+        served yet. Cards stored before shown_at existed have no such field
+        and are left alone rather than back-stamped with a later time.
+        """
+        cls.collection.update_many({
+            'session_id': as_object_id(session_id),
+            'round_number': round_number,
+            'shown_at': {'$exists': True, '$eq': None}
+        }, {'$set': {'shown_at': datetime.utcnow()}})
+    
     @classmethod
     def find_by_session(cls, session_id: ObjectId):
         """Find all job cards for a session."""
         return cls.find_many(
-            {'session_id': ObjectId(session_id)},
+            {'session_id': as_object_id(session_id)},
             sort=[('round_number', 1), ('card_label', 1)]
         )
     
@@ -52,17 +109,10 @@ class GeneratedJobCard(BaseModel):
     def find_by_round(cls, session_id: ObjectId, round_number: int):
         """Find job cards for a specific round."""
         return cls.find_many({
-            'session_id': ObjectId(session_id),
+            'session_id': as_object_id(session_id),
             'round_number': round_number
         })
     
-    @classmethod
-    def ensure_indexes(cls):
-        """Create indexes for the collection."""
-        instance = cls.__new__(cls)
-        instance.collection.create_index('session_id')
-        instance.collection.create_index([('session_id', 1), ('round_number', 1)])
-    
     def to_dict(self) -> dict:
         """Convert to dictionary."""
         return {
@@ -70,18 +120,22 @@ class GeneratedJobCard(BaseModel):
             'card_label': self.card_label,
             'attributes': self.attributes,
             'rendered_text': self.rendered_text,
+            'rendered_html': self.rendered_html,
             'round_number': self.round_number,
+            'shown_at': self.shown_at,
             'created_at': self.created_at
         }
     
     def to_json(self) -> dict:
-        """Convert to JSON-serializable dictionary."""
+        """Convert to dictionary for JSON responses (encoded by app.json)."""
         return {
-            'id': str(self.id) if self.id else None,
-            'session_id': str(self.session_id) if self.session_id else None,
+            'id': self.id,
+            'session_id': self.session_id,
             'card_label': self.card_label,
             'attributes': self.attributes,
             'rendered_text': self.rendered_text,
+            'rendered_html': self.rendered_html,
             'round_number': self.round_number,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'shown_at': self.shown_at,
+            'created_at': self.created_at
         }
@@ -1,8 +1,13 @@
 """
 JobAttribute Model - Defines attribute dimensions and levels for conjoint analysis
 """
+import sys
 from datetime import datetime
+from html import escape
 from bson import ObjectId
+from types import MappingProxyType
+from pymongo import IndexModel
+from pymongo.errors import BulkWriteError
 from app.models.base import BaseModel
 
 
@@ -28,35 +33,110 @@ class JobAttribute(BaseModel):
     
     collection_name = 'job_attributes'
     
+    # display_name and levels are properties backed by their raw values plus
+    # lookup/HTML-escaped forms derived once on assignment
+    __slots__ = ('attribute_key', '_display_name', '_display_name_html',
+                 '_levels', '_level_index', '_level_index_html', 'level_ids',
+                 'created_at', 'id')
+    
+    indexes = [
+        IndexModel('attribute_key', unique=True)
+    ]
+    
     def __init__(self, attribute_key: str, display_name: str, levels: list):
-        self.attribute_key = attribute_key
+        self.attribute_key = sys.intern(attribute_key)
         self.display_name = display_name
         self.levels = levels  # [{'level_id': str, 'display_text': str}, ...]
         self.created_at = datetime.utcnow()
         self.id = None
     
     @classmethod
-    def find_by_key(cls, attribute_key: str):
+    def find_by_key(cls, attribute_key: str, projection: dict = None):
         """Find attribute by key."""
-        return cls.find_one({'attribute_key': attribute_key})
+        return cls.find_one({'attribute_key': attribute_key}, projection=projection)
+    
+    @classmethod
+    def seed_defaults(cls) -> int:
+        """
+        Insert any DEFAULT_JOB_ATTRIBUTES not stored yet, in one insert_many.
+        Existing attributes are left untouched. Returns the number inserted.
+        """
+        # One indexed read first: on every start after the first, nothing is
+        # missing and no write is issued at all
+        default_keys = [attr_data['attribute_key'] for attr_data in DEFAULT_JOB_ATTRIBUTES]
+        existing_keys = {
+            doc['attribute_key'] for doc in cls.collection.find(
+                {'attribute_key': {'$in': default_keys}},
+                {'_id': 0, 'attribute_key': 1}
+            )
+        }
+        missing = [
+            attr_data for attr_data in DEFAULT_JOB_ATTRIBUTES
+            if attr_data['attribute_key'] not in existing_keys
+        ]
+        if not missing:
+            return 0
+        
+        now = datetime.utcnow()
+        documents = [{
+            'attribute_key': attr_data['attribute_key'],
+            'display_name': attr_data['display_name'],
+            'levels': attr_data['levels'],
+            'created_at': now
+        } for attr_data in missing]
+        
+        # Unordered, so a key inserted meanwhile by a concurrent seeder only
+        # fails its own document (unique index) and the rest still go in
+        try:
+            return len(cls.collection.insert_many(documents, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            if any(error.get('code') != 11000 for error in e.details.get('writeErrors', ())):
+                raise
+            return e.details.get('nInserted', 0)
     
     @classmethod
     def get_all_attributes(cls):
         """Get all attribute definitions."""
         return cls.find_many({})
     
+    def _loaded(self):
+        # Keys and level ids come from a small fixed vocabulary, so interning
+        # them is safe and makes card-attribute dict lookups compare by identity
+        if self.attribute_key is not None:
+            self.attribute_key = sys.intern(self.attribute_key)
+    
+    @property
+    def display_name(self) -> str:
+        return self._display_name
+    
+    @display_name.setter
+    def display_name(self, display_name: str):
+        self._display_name = display_name
+        self._display_name_html = escape(display_name) if display_name else display_name
+    
+    @property
+    def levels(self) -> list:
+        return self._levels
+    
+    @levels.setter
+    def levels(self, levels: list):
+        # Assigned by __init__, from_dict and level updates alike, so the
+        # level_id -> display_text indexes never go stale
+        self._levels = levels
+        # Level ids in definition order, read by the randomization strategies
+        self.level_ids = tuple(sys.intern(level['level_id']) for level in levels or ())
+        self._level_index = {
+            level_id: level['display_text']
+            for level_id, level in zip(self.level_ids, levels or ())
+        }
+        # Levels are fixed configuration: escape for HTML once, not per render
+        self._level_index_html = {
+            level_id: escape(text) for level_id, text in self._level_index.items()
+        }
+    
     def get_level_text(self, level_id: str) -> str:
         """Get display text for a level ID."""
-        for level in self.levels:
-            if level['level_id'] == level_id:
-                return level['display_text']
-        return level_id
-    
-    @classmethod
-    def ensure_indexes(cls):
-        """Create indexes for the collection."""
-        instance = cls.__new__(cls)
-        instance.collection.create_index('attribute_key', unique=True)
+        return self._level_index.get(level_id, level_id)
     
     def to_dict(self) -> dict:
         """Convert to dictionary."""
@@ -68,18 +148,27 @@ class JobAttribute(BaseModel):
         }
     
     def to_json(self) -> dict:
-        """Convert to JSON-serializable dictionary."""
+        """Convert to dictionary for JSON responses (encoded by app.json)."""
         return {
-            'id': str(self.id) if self.id else None,
+            'id': self.id,
             'attribute_key': self.attribute_key,
             'display_name': self.display_name,
             'levels': self.levels,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at
         }
 
 
+def _freeze_attribute(attr: dict) -> MappingProxyType:
+    """Make a default attribute definition read-only, levels included."""
+    return MappingProxyType({
+        **attr,
+        'levels': tuple(MappingProxyType(level) for level in attr['levels'])
+    })
+
+
 # Default job attributes for conjoint analysis - matches company comparison card format
-DEFAULT_JOB_ATTRIBUTES = [
+# Read-only and shared by reference; BSON encodes the tuples and mappings as-is
+DEFAULT_JOB_ATTRIBUTES = tuple(_freeze_attribute(attr) for attr in [
     {
         'attribute_key': 'company_description',
         'display_name': 'Company description',
@@ -135,4 +224,4 @@ DEFAULT_JOB_ATTRIBUTES = [
             }
         ]
     }
-]
+])
@@ -4,6 +4,8 @@ PII is separated from experimental data
 """
 from datetime import datetime
 from bson import ObjectId
+from pymongo import IndexModel, ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from app.models.base import BaseModel
 
 
@@ -21,6 +23,12 @@ class User(BaseModel):
     
     collection_name = 'users'
     
+    __slots__ = ('email', 'name', 'zip_code', 'timezone', 'created_at', 'id')
+    
+    indexes = [
+        IndexModel('email', unique=True)
+    ]
+    
     def __init__(self, email: str, name: str = None, zip_code: str = None, 
                  timezone: str = None):
         self.email = email
@@ -31,9 +39,9 @@ class User(BaseModel):
         self.id = None
     
     @classmethod
-    def find_by_email(cls, email: str):
+    def find_by_email(cls, email: str, projection: dict = None):
         """Find user by email address."""
-        return cls.find_one({'email': email})
+        return cls.find_one({'email': email}, projection=projection)
     
     @classmethod
     def create_or_get(cls, email: str, name: str = None, zip_code: str = None):
@@ -41,19 +49,58 @@ class User(BaseModel):
         Get existing user or create new one.
         Ensures email uniqueness.
         """
-        existing = cls.find_by_email(email)
-        if existing:
-            return existing, False
-        
         user = cls(email=email, name=name, zip_code=zip_code)
-        user.save()
-        return user, True
+        new_id = ObjectId()
+        
+        # Single round-trip: insert if missing, otherwise return the existing doc
+        try:
+            data = cls.collection.find_one_and_update(
+                {'email': email},
+                {'$setOnInsert': {'_id': new_id, **user.to_dict()}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Lost a race with a concurrent upsert on the unique email index
+            return cls.find_by_email(email), False
+        
+        return cls.from_dict(data), data['_id'] == new_id
     
     @classmethod
-    def ensure_indexes(cls):
-        """Create indexes for the collection."""
-        instance = cls.__new__(cls)
-        instance.collection.create_index('email', unique=True)
+    def upsert_profile(cls, email: str, name: str = None, zip_code: str = None):
+        """
+        Get or create the user for email, overwriting name and zip code with
+        any values given, in one round-trip.
+        """
+        user = cls(email=email, name=name, zip_code=zip_code)
+        new_id = ObjectId()
+        
+        changes = {}
+        if name:
+            changes['name'] = name
+        if zip_code:
+            changes['zip_code'] = zip_code
+        
+        # A field may not appear in both $set and $setOnInsert
+        on_insert = {k: v for k, v in user.to_dict().items() if k not in changes}
+        update = {'$setOnInsert': {'_id': new_id, **on_insert}}
+        if changes:
+            update['$set'] = changes
+        
+        try:
+            data = cls.collection.find_one_and_update(
+                {'email': email}, update,
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Lost a race with a concurrent upsert; the retry matches the winner
+            data = cls.collection.find_one_and_update(
+                {'email': email}, update,
+                return_document=ReturnDocument.AFTER
+            )
+        
+        return cls.from_dict(data), data['_id'] == new_id
     
     def to_dict(self) -> dict:
         """Convert to dictionary."""
@@ -66,12 +113,12 @@ class User(BaseModel):
         }
     
     def to_json(self) -> dict:
-        """Convert to JSON-serializable dictionary."""
+        """Convert to dictionary for JSON responses (encoded by app.json)."""
         return {
-            'id': str(self.id) if self.id else None,
+            'id': self.id,
             'email': self.email,
             'name': self.name,
             'zip_code': self.zip_code,
             'timezone': self.timezone,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at
         }
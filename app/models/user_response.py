@@ -5,11 +5,17 @@ Immutable after write
 from datetime import datetime
 from enum import Enum
 from bson import ObjectId
-from app.models.base import BaseModel
+from pymongo import IndexModel, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.models.base import BaseModel, as_object_id
 
 
-class QuestionType(Enum):
-    """Question type enumeration."""
+class QuestionType(str, Enum):
+    """
+    Question type enumeration.
+    A str subclass: members compare equal to the stored strings, so hot
+    loops never need to construct QuestionType(value).
+    """
     TEXT = 'text'
     CHOICE = 'choice'
     NUMBER = 'number'
@@ -33,6 +39,20 @@ class UserResponse(BaseModel):
     
     collection_name = 'user_responses'
     
+    # Fixed field set; created_at is stamped by BaseModel.save()
+    __slots__ = ('session_id', 'question_id', 'question_type', 'raw_input',
+                 'normalized_value', 'timestamp', 'created_at', 'id')
+    
+    # (session_id, question_id) is unique: one immutable answer per question,
+    # enforced even for concurrent saves. (session_id, timestamp) serves the
+    # per-session reads in answer order without an in-memory sort.
+    # Existing databases that already hold duplicate answers cannot build the
+    # unique index; ensure_all_indexes logs that until the duplicates are removed.
+    indexes = [
+        IndexModel([('session_id', 1), ('question_id', 1)], unique=True),
+        IndexModel([('session_id', 1), ('timestamp', 1)])
+    ]
+    
     def __init__(self, session_id: ObjectId, question_id: str, 
                  question_type: str, raw_input: str, 
                  normalized_value=None):
@@ -40,32 +60,57 @@ class UserResponse(BaseModel):
         self.question_id = question_id
         self.question_type = question_type
         self.raw_input = raw_input
-        self.normalized_value = normalized_value or raw_input
+        self.normalized_value = raw_input if normalized_value is None else normalized_value
         self.timestamp = datetime.utcnow()
         self.id = None
     
+    def save_if_absent(self):
+        """
+        Insert this response unless its question was already answered in the
+        session, in one upsert round-trip (responses are immutable, so an
+        existing one is never modified).
+        
+        Returns:
+            (stored UserResponse, created)
+        """
+        new_id = ObjectId()
+        key = {'session_id': self.session_id, 'question_id': self.question_id}
+        try:
+            data = self.collection.find_one_and_update(
+                key,
+                {'$setOnInsert': {'_id': new_id, 'created_at': datetime.utcnow(),
+                                  **self.to_dict()}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Lost a race with a concurrent save on the unique index
+            return self.find_one(key), False
+        return self.from_dict(data), data['_id'] == new_id
+    
     @classmethod
-    def find_by_session(cls, session_id: ObjectId):
-        """Find all responses for a session."""
-        return cls.find_many(
-            {'session_id': ObjectId(session_id)},
-            sort=[('timestamp', 1)]
-        )
+    def projected_by_session(cls, session_id: ObjectId, fields: tuple,
+                             batch_size: int = 500):
+        """
+        Cursor over a session's raw response documents in answer order,
+        carrying only fields (no _id). No model objects are constructed.
+        """
+        projection = dict.fromkeys(fields, 1)
+        projection['_id'] = 0
+        return cls.collection.find(
+            {'session_id': as_object_id(session_id)},
+            projection,
+            batch_size=batch_size
+        ).sort('timestamp', 1)
     
     @classmethod
-    def get_response(cls, session_id: ObjectId, question_id: str):
+    def get_response(cls, session_id: ObjectId, question_id: str,
+                     projection: dict = None):
         """Get specific response for a question in a session."""
         return cls.find_one({
-            'session_id': ObjectId(session_id),
+            'session_id': as_object_id(session_id),
             'question_id': question_id
-        })
-    
-    @classmethod
-    def ensure_indexes(cls):
-        """Create indexes for the collection."""
-        instance = cls.__new__(cls)
-        instance.collection.create_index('session_id')
-        instance.collection.create_index([('session_id', 1), ('question_id', 1)])
+        }, projection=projection)
     
     def to_dict(self) -> dict:
         """Convert to dictionary."""
@@ -79,13 +124,13 @@ class UserResponse(BaseModel):
         }
     
     def to_json(self) -> dict:
-        """Convert to JSON-serializable dictionary."""
+        """Convert to dictionary for JSON responses (encoded by app.json)."""
         return {
-            'id': str(self.id) if self.id else None,
-            'session_id': str(self.session_id) if self.session_id else None,
+            'id': self.id,
+            'session_id': self.session_id,
             'question_id': self.question_id,
             'question_type': self.question_type,
             'raw_input': self.raw_input,
             'normalized_value': self.normalized_value,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None
+            'timestamp': self.timestamp
         }
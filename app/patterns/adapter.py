@@ -3,11 +3,12 @@ Adapter Pattern Implementation
 Export adapters for converting experiment data to various formats
 """
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator
 import json
 from datetime import datetime
 from bson import ObjectId
 from io import StringIO
+from app.json import dumps
 
 
 class ExportAdapter(ABC):
@@ -21,6 +22,14 @@ class ExportAdapter(ABC):
         """Export data to target format."""
         pass
     
+    def stream(self, data: Iterable[Dict]) -> Iterator[str]:
+        """
+        Export data as a sequence of text chunks.
+        Formats that need every row up front (e.g. column-wise R vectors)
+        use this default and emit the whole export as one chunk.
+        """
+        yield self.export(list(data))
+    
     @abstractmethod
     def get_content_type(self) -> str:
         """Get MIME content type for the export."""
@@ -54,17 +63,22 @@ class CSVExportAdapter(ExportAdapter):
         self.delimiter = delimiter
     
     def export(self, data: List[Dict]) -> str:
-        if not data:
-            return ""
-        
-        output = StringIO()
-        
+        return ''.join(self.stream(data))
+    
+    def stream(self, data: Iterable[Dict]) -> Iterator[str]:
+        """
+        Yield the header line, then one line per row.
+        The header is the union of all row keys, so rows are flattened up
+        front; only the output text is produced incrementally.
+        """
         # Flatten nested structures and get all headers
         flattened_data = [self._flatten_dict(row) for row in data]
+        if not flattened_data:
+            return
         headers = self._get_all_headers(flattened_data)
         
         # Write header row
-        output.write(self.delimiter.join(headers) + '\n')
+        yield self.delimiter.join(headers) + '\n'
         
         # Write data rows
         for row in flattened_data:
@@ -76,9 +90,7 @@ class CSVExportAdapter(ExportAdapter):
                 if isinstance(value, str) and (self.delimiter in value or '\n' in value):
                     value = f'"{value}"'
                 values.append(str(value) if value is not None else '')
-            output.write(self.delimiter.join(values) + '\n')
-        
-        return output.getvalue()
+            yield self.delimiter.join(values) + '\n'
     
     def _flatten_dict(self, d: Dict, parent_key: str = '', sep: str = '_') -> Dict:
         """Flatten nested dictionary."""
@@ -117,9 +129,28 @@ class JSONExportAdapter(ExportAdapter):
     def export(self, data: List[Dict]) -> str:
         serialized = [self._serialize_value(row) for row in data]
         
+        return dumps(serialized, indent=self.pretty).decode()
+    
+    def stream(self, data: Iterable[Dict]) -> Iterator[str]:
+        """
+        Yield the JSON array one element at a time, byte-for-byte the same
+        as export().
+        """
         if self.pretty:
-            return json.dumps(serialized, indent=2)
-        return json.dumps(serialized)
+            opening, separator, closing = '[\n  ', ',\n  ', '\n]'
+        else:
+            opening, separator, closing = '[', ',', ']'
+        
+        prefix = opening
+        for row in data:
+            text = dumps(self._serialize_value(row), indent=self.pretty).decode()
+            if self.pretty:
+                # Nest the element one level inside the array
+                text = text.replace('\n', '\n  ')
+            yield prefix + text
+            prefix = separator
+        
+        yield '[]' if prefix is opening else closing
     
     def get_content_type(self) -> str:
         return 'application/json'
@@ -3,6 +3,8 @@ Factory Pattern Implementation
 JobCardFactory creates schematic job advertisements for conjoint experiments
 """
 from abc import ABC, abstractmethod
+from functools import lru_cache
+from html import escape
 from typing import Dict, List, Tuple
 from bson import ObjectId
 from app.models.job_attribute import JobAttribute
@@ -10,6 +12,69 @@ from app.models.generated_job_card import GeneratedJobCard
 from app.services.attribute_service import AttributeService
 
 
+@lru_cache(maxsize=8)
+def _render_plan(attribute_definitions: Tuple[JobAttribute, ...]) -> tuple:
+    """
+    Precompute (attribute_key, label prefix, level index) per attribute.
+    Keyed by the attribute objects themselves: AttributeService hands out the
+    same cached list until it is invalidated, so every card reuses one plan.
+    """
+    return tuple(
+        (attr.attribute_key, f"**{attr.display_name}**: ", attr._level_index)
+        for attr in attribute_definitions
+    )
+
+
+@lru_cache(maxsize=4096)
+def _memoized_pair(strategy_key: tuple, attribute_definitions: Tuple[JobAttribute, ...],
+                   round_number: int, session_seed: str) -> tuple:
+    """
+    Attribute pair for a round from a pure strategy, memoized so a retried
+    round skips the randomization. Callers must not mutate the returned dicts.
+    """
+    strategy_class, args = strategy_key
+    return strategy_class(*args).generate_pair(
+        list(attribute_definitions), round_number, session_seed
+    )
+
+
+# Card markup, matching what the frontend's renderCardAttributes builds:
+# long values (and the free-text attributes) get the long-text class
+_HTML_ROW_TEMPLATE = (
+    '<div class="%s">'
+    '<span class="attribute-label">%s</span>'
+    '<span class="attribute-value">%s</span>'
+    '</div>'
+)
+_LONG_TEXT_KEYS = frozenset(('company_description', 'culture_values'))
+_LONG_TEXT_LENGTH = 100
+
+
+@lru_cache(maxsize=8)
+def _html_plan(attribute_definitions: Tuple[JobAttribute, ...]) -> dict:
+    """
+    Precompute {attribute_key: (label, level index, escaped level index)} for
+    HTML rendering, using the HTML-escaped forms each JobAttribute builds
+    when it is loaded.
+    """
+    return {
+        attr.attribute_key: (attr._display_name_html, attr._level_index, attr._level_index_html)
+        for attr in attribute_definitions
+    }
+
+
+def _html_row(key: str, level_id: str, plan_entry: tuple) -> str:
+    """Render one attribute of a card."""
+    label, level_index, level_index_html = plan_entry
+    text = level_index.get(level_id, level_id)
+    long_text = key in _LONG_TEXT_KEYS or len(text) > _LONG_TEXT_LENGTH
+    return _HTML_ROW_TEMPLATE % (
+        'job-attribute long-text' if long_text else 'job-attribute',
+        label,
+        level_index_html.get(level_id) or escape(level_id)
+    )
+
+
 class JobCardBuilder:
     """
     Builder pattern for constructing job cards step by step.
@@ -31,30 +96,38 @@ class JobCardBuilder:
     
     def build_rendered_text(self, attribute_definitions: List[JobAttribute]) -> 'JobCardBuilder':
         """Build human-readable text from attributes."""
-        lines = []
-        
-        for attr_def in attribute_definitions:
-            if attr_def.attribute_key in self._attributes:
-                level_id = self._attributes[attr_def.attribute_key]
-                display_text = attr_def.get_level_text(level_id)
-                lines.append(f"**{attr_def.display_name}**: {display_text}")
+        plan = _render_plan(tuple(attribute_definitions))
+        attributes = self._attributes
         
-        self._rendered_text = "\n".join(lines)
+        self._rendered_text = "\n".join(
+            prefix + level_index.get(attributes[key], attributes[key])
+            for key, prefix, level_index in plan
+            if key in attributes
+        )
         return self
     
     def build(self, session_id: ObjectId, card_label: str, 
               round_number: int) -> GeneratedJobCard:
-        """Build the final job card."""
+        """
+        Build the final job card.
+        The card takes ownership of the attribute dict; the builder starts
+        over with a fresh one rather than copying.
+        """
+        attributes, self._attributes = self._attributes, {}
         return GeneratedJobCard(
             session_id=session_id,
             card_label=card_label,
-            attributes=self._attributes.copy(),
+            attributes=attributes,
             rendered_text=self._rendered_text,
             round_number=round_number
         )
     
     def reset(self):
-        """Reset builder for reuse."""
+        """
+        Reset builder for reuse.
+        Starts a fresh attribute dict: the previous one may already be owned
+        by a built card, so it is never cleared in place.
+        """
         self._attributes = {}
         self._rendered_text = ""
         return self
@@ -69,23 +142,19 @@ class JobCardFactory:
     def __init__(self, randomization_strategy=None):
         from app.patterns.strategy import SeededRandomStrategy
         self._strategy = randomization_strategy or SeededRandomStrategy()
-        self._builder = JobCardBuilder()
-        self._attribute_definitions = None
     
     def set_strategy(self, strategy) -> 'JobCardFactory':
         """Set randomization strategy (Strategy pattern)."""
         self._strategy = strategy
         return self
     
-    def _load_attributes(self) -> List[JobAttribute]:
+    def _load_attributes(self) -> Tuple[JobAttribute, ...]:
         """
-        Lazy load attribute definitions via AttributeService.
-        Ensures initialization and provides clear error on failure.
+        Load attribute definitions via AttributeService.
+        The service keeps one process-wide cache, so factories created per
+        request share a single fetch instead of each loading their own copy.
         """
-        if self._attribute_definitions is None:
-            # Use AttributeService which handles initialization
-            self._attribute_definitions = AttributeService.get_all_attributes()
-        return self._attribute_definitions
+        return AttributeService.get_all_attributes()
     
     def create_card_pair(self, session_id: ObjectId, round_number: int,
                          session_seed: str) -> Tuple[GeneratedJobCard, GeneratedJobCard]:
@@ -103,56 +172,50 @@ class JobCardFactory:
         attributes = self._load_attributes()
         
         # Generate attribute combinations using strategy
-        attrs_a, attrs_b = self._strategy.generate_pair(
-            attributes, round_number, session_seed
-        )
+        strategy_key = self._strategy.cache_key()
+        if strategy_key is None:
+            attrs_a, attrs_b = self._strategy.generate_pair(
+                attributes, round_number, session_seed
+            )
+        else:
+            attrs_a, attrs_b = _memoized_pair(
+                strategy_key, tuple(attributes), round_number, session_seed
+            )
+        
+        # Builders are stateful, and one factory serves every request thread
+        # and the pre-generation workers, so each call builds with its own
+        builder = JobCardBuilder()
         
         # Build Card A
-        self._builder.reset()
-        card_a = (self._builder
+        card_a = (builder
                   .set_attributes(attrs_a)
                   .build_rendered_text(attributes)
                   .build(session_id, 'A', round_number))
         
-        # Build Card B
-        self._builder.reset()
-        card_b = (self._builder
+        # Build Card B (build() already handed card A its dict and started a
+        # fresh one, so no reset is needed)
+        card_b = (builder
                   .set_attributes(attrs_b)
                   .build_rendered_text(attributes)
                   .build(session_id, 'B', round_number))
         
-        return card_a, card_b
-    
-    def create_and_save_card_pair(self, session_id: ObjectId, round_number: int,
-                                   session_seed: str) -> Tuple[GeneratedJobCard, GeneratedJobCard]:
-        """Create and persist a card pair."""
-        card_a, card_b = self.create_card_pair(session_id, round_number, session_seed)
-        card_a.save()
-        card_b.save()
+        # Cards are immutable once built, so their markup is rendered once here
+        card_a.rendered_html = self.render_card_html(card_a)
+        card_b.rendered_html = self.render_card_html(card_b)
+        
         return card_a, card_b
     
     def render_card_html(self, card: GeneratedJobCard) -> str:
         """
-        Render a job card as HTML for display.
+        Render a job card's attributes as HTML for display, in the card's
+        attribute order; the frontend inserts it into the card as is.
         """
-        attributes = self._load_attributes()
-        
-        html_parts = ['<div class="job-card-content">']
-        
-        for attr_def in attributes:
-            if attr_def.attribute_key in card.attributes:
-                level_id = card.attributes[attr_def.attribute_key]
-                display_text = attr_def.get_level_text(level_id)
-                
-                html_parts.append(f'''
-                    <div class="job-attribute">
-                        <span class="attribute-label">{attr_def.display_name}:</span>
-                        <span class="attribute-value">{display_text}</span>
-                    </div>
-                ''')
-        
-        html_parts.append('</div>')
-        return ''.join(html_parts)
+        plan = _html_plan(tuple(self._load_attributes()))
+        return ''.join(
+            _html_row(key, level_id, plan[key])
+            for key, level_id in card.attributes.items()
+            if key in plan
+        )
 
 
 class AbstractJobCardFactory(ABC):
@@ -198,27 +261,23 @@ class SimplifiedJobCardFactory(AbstractJobCardFactory):
     def __init__(self):
         from app.patterns.strategy import SeededRandomStrategy
         self._strategy = SeededRandomStrategy()
-        self._builder = JobCardBuilder()
     
     def create_card_pair(self, session_id: ObjectId, round_number: int,
                          session_seed: str) -> Tuple[GeneratedJobCard, GeneratedJobCard]:
-        all_attributes = JobAttribute.get_all_attributes()
-        # Filter to core attributes only
-        attributes = [a for a in all_attributes 
-                      if a.attribute_key in self.CORE_ATTRIBUTES]
+        # Core attributes only; the filtered subset is cached by the service
+        attributes = AttributeService.get_attribute_subset(self.CORE_ATTRIBUTES)
         
         attrs_a, attrs_b = self._strategy.generate_pair(
             attributes, round_number, session_seed
         )
         
-        self._builder.reset()
-        card_a = (self._builder
+        builder = JobCardBuilder()
+        card_a = (builder
                   .set_attributes(attrs_a)
                   .build_rendered_text(attributes)
                   .build(session_id, 'A', round_number))
         
-        self._builder.reset()
-        card_b = (self._builder
+        card_b = (builder
                   .set_attributes(attrs_b)
                   .build_rendered_text(attributes)
                   .build(session_id, 'B', round_number))
@@ -6,7 +6,42 @@ from abc import ABC, abstractmethod
 from typing import Dict, List, Tuple
 import random
 import hashlib
-from itertools import product
+from collections import Counter
+from functools import lru_cache
+from math import prod
+
+_MASK64 = (1 << 64) - 1
+
+
+@lru_cache(maxsize=1024)
+def _seed64(session_seed: str) -> int:
+    """
+    Stable 64-bit value for a session seed, computed once per session.
+    (Builtin hash() is salted per process, so it would break reproducibility
+    across workers and restarts.)
+    """
+    digest = hashlib.blake2b(session_seed.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def _mix64(z: int) -> int:
+    """splitmix64 finalizer: cheap, well-distributed 64-bit integer mix."""
+    z = (z * 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+
+@lru_cache(maxsize=8)
+def _level_table(attributes: tuple) -> tuple:
+    """
+    (attribute_key, level_ids) per attribute, built once per attribute set
+    instead of on every draw.
+    """
+    return tuple(
+        (attr.attribute_key, attr.level_ids)
+        for attr in attributes
+    )
 
 
 class RandomizationStrategy(ABC):
@@ -31,12 +66,18 @@ class RandomizationStrategy(ABC):
         """
         pass
     
+    def cache_key(self):
+        """
+        Return (strategy class, constructor args) if generate_pair is a pure
+        function of its arguments, so results can be memoized across
+        instances; None for stateful strategies.
+        """
+        return None
+    
     def _create_seeded_random(self, session_seed: str, round_number: int) -> random.Random:
         """Create a seeded random generator for reproducibility."""
         # Combine seed with round for unique but reproducible randomization
-        combined_seed = f"{session_seed}_{round_number}"
-        seed_hash = int(hashlib.sha256(combined_seed.encode()).hexdigest(), 16) % (2**32)
-        return random.Random(seed_hash)
+        return random.Random(_mix64(_seed64(session_seed) ^ round_number))
 
 
 class SeededRandomStrategy(RandomizationStrategy):
@@ -45,21 +86,22 @@ class SeededRandomStrategy(RandomizationStrategy):
     Randomly selects levels for each attribute with deterministic seed.
     """
     
+    def cache_key(self):
+        return (type(self), ())
+    
     def generate_pair(self, attributes: List, round_number: int,
                       session_seed: str) -> Tuple[Dict[str, str], Dict[str, str]]:
-        rng = self._create_seeded_random(session_seed, round_number)
+        choice = self._create_seeded_random(session_seed, round_number).choice
         
         attrs_a = {}
         attrs_b = {}
         
-        for attr in attributes:
-            levels = [level['level_id'] for level in attr.levels]
-            
+        for key, levels in _level_table(tuple(attributes)):
             # Random selection for card A
-            attrs_a[attr.attribute_key] = rng.choice(levels)
+            attrs_a[key] = choice(levels)
             
             # Random selection for card B
-            attrs_b[attr.attribute_key] = rng.choice(levels)
+            attrs_b[key] = choice(levels)
         
         return attrs_a, attrs_b
 
@@ -73,18 +115,20 @@ class BalancedRandomStrategy(RandomizationStrategy):
     def __init__(self, min_differences: int = 2):
         self.min_differences = min_differences
     
+    def cache_key(self):
+        return (type(self), (self.min_differences,))
+    
     def generate_pair(self, attributes: List, round_number: int,
                       session_seed: str) -> Tuple[Dict[str, str], Dict[str, str]]:
         rng = self._create_seeded_random(session_seed, round_number)
+        randrange = rng.randrange
+        table = _level_table(tuple(attributes))
         
-        attrs_a = {}
+        # First pass: random level index for card A
+        a_indices = [randrange(len(levels)) for _, levels in table]
+        attrs_a = {key: levels[a_idx] for (key, levels), a_idx in zip(table, a_indices)}
         attrs_b = {}
         
-        # First pass: random selection for card A
-        for attr in attributes:
-            levels = [level['level_id'] for level in attr.levels]
-            attrs_a[attr.attribute_key] = rng.choice(levels)
-        
         # Second pass: ensure minimum differences for card B
         attr_keys = list(attrs_a.keys())
         rng.shuffle(attr_keys)
@@ -92,19 +136,17 @@ class BalancedRandomStrategy(RandomizationStrategy):
         # Select attributes that must differ
         differ_attrs = set(attr_keys[:self.min_differences])
         
-        for attr in attributes:
-            levels = [level['level_id'] for level in attr.levels]
-            
-            if attr.attribute_key in differ_attrs:
-                # Must be different from A
-                other_levels = [l for l in levels if l != attrs_a[attr.attribute_key]]
-                if other_levels:
-                    attrs_b[attr.attribute_key] = rng.choice(other_levels)
-                else:
-                    attrs_b[attr.attribute_key] = rng.choice(levels)
+        for (key, levels), a_idx in zip(table, a_indices):
+            n = len(levels)
+            if key in differ_attrs and n > 1:
+                # Must be different from A: draw among the other n - 1 levels
+                # and step over A's index
+                b_idx = randrange(n - 1)
+                b_idx += b_idx >= a_idx
             else:
                 # Random selection
-                attrs_b[attr.attribute_key] = rng.choice(levels)
+                b_idx = randrange(n)
+            attrs_b[key] = levels[b_idx]
         
         return attrs_a, attrs_b
 
@@ -112,53 +154,49 @@ class BalancedRandomStrategy(RandomizationStrategy):
 class FullFactorialStrategy(RandomizationStrategy):
     """
     Full factorial design strategy.
-    Pre-generates all possible combinations and selects pairs systematically.
-    Useful for smaller attribute spaces or when complete coverage is needed.
+    Selects pairs uniformly from all possible combinations systematically.
+    Combinations are indexed in Cartesian-product order and decoded on demand,
+    so the product itself is never materialized.
     """
     
-    def __init__(self):
-        self._combinations_cache = {}
+    def cache_key(self):
+        return (type(self), ())
     
-    def _generate_all_combinations(self, attributes: List) -> List[Dict[str, str]]:
-        """Generate all possible attribute combinations."""
-        cache_key = tuple(attr.attribute_key for attr in attributes)
-        
-        if cache_key in self._combinations_cache:
-            return self._combinations_cache[cache_key]
-        
-        # Get all levels for each attribute
-        all_levels = []
-        attr_keys = []
-        
-        for attr in attributes:
-            attr_keys.append(attr.attribute_key)
-            all_levels.append([level['level_id'] for level in attr.levels])
-        
-        # Generate Cartesian product
-        combinations = []
-        for combo in product(*all_levels):
-            combinations.append(dict(zip(attr_keys, combo)))
-        
-        self._combinations_cache[cache_key] = combinations
-        return combinations
+    def _generate_all_combinations(self, attributes: List) -> Tuple[tuple, int]:
+        """
+        Describe the combination space: ((attribute_key, level_ids), ...) and
+        the total number of combinations.
+        """
+        table = _level_table(tuple(attributes))
+        return table, prod(len(levels) for _, levels in table)
+    
+    @staticmethod
+    def _decode(table: tuple, index: int) -> Dict[str, str]:
+        """Decode a combination index (mixed radix, last attribute fastest)."""
+        digits = []
+        for _, levels in reversed(table):
+            index, digit = divmod(index, len(levels))
+            digits.append(digit)
+        return {
+            key: levels[digit]
+            for (key, levels), digit in zip(table, reversed(digits))
+        }
     
     def generate_pair(self, attributes: List, round_number: int,
                       session_seed: str) -> Tuple[Dict[str, str], Dict[str, str]]:
-        combinations = self._generate_all_combinations(attributes)
+        table, n = self._generate_all_combinations(attributes)
         rng = self._create_seeded_random(session_seed, round_number)
         
         # Select two different combinations
-        n = len(combinations)
         idx_a = rng.randint(0, n - 1)
-        idx_b = rng.randint(0, n - 1)
+        if n == 1:
+            return self._decode(table, 0), self._decode(table, 0)
         
-        # Ensure they're different
-        attempts = 0
-        while idx_b == idx_a and attempts < 100:
-            idx_b = rng.randint(0, n - 1)
-            attempts += 1
+        # Draw among the other n - 1 combinations and step over A's index
+        idx_b = rng.randint(0, n - 2)
+        idx_b += idx_b >= idx_a
         
-        return combinations[idx_a].copy(), combinations[idx_b].copy()
+        return self._decode(table, idx_a), self._decode(table, idx_b)
 
 
 class ConstrainedRandomStrategy(RandomizationStrategy):
@@ -174,37 +212,41 @@ class ConstrainedRandomStrategy(RandomizationStrategy):
                 [{'if': {'attr': 'val'}, 'then': {'attr': 'val'}}, ...]
         """
         self.constraints = constraints or []
+        
+        # Compiled once: ((if_key, if_value), ...) and the 'then' updates
+        self._compiled = [
+            (tuple(c.get('if', {}).items()), dict(c.get('then', {})))
+            for c in self.constraints
+        ]
     
     def _apply_constraints(self, attrs: Dict[str, str]) -> Dict[str, str]:
-        """Apply constraint rules to attributes."""
-        result = attrs.copy()
+        """
+        Apply constraint rules to attributes.
+        attrs is updated in place: generate_pair builds a fresh dict per card,
+        so there is nothing to protect with a copy.
+        """
+        get = attrs.get
         
-        for constraint in self.constraints:
-            if_condition = constraint.get('if', {})
-            then_action = constraint.get('then', {})
-            
+        for if_items, then_action in self._compiled:
             # Check if condition is met
-            condition_met = all(
-                result.get(attr) == val 
-                for attr, val in if_condition.items()
-            )
-            
-            if condition_met:
-                result.update(then_action)
+            for attr, val in if_items:
+                if get(attr) != val:
+                    break
+            else:
+                attrs.update(then_action)
         
-        return result
+        return attrs
     
     def generate_pair(self, attributes: List, round_number: int,
                       session_seed: str) -> Tuple[Dict[str, str], Dict[str, str]]:
-        rng = self._create_seeded_random(session_seed, round_number)
+        choice = self._create_seeded_random(session_seed, round_number).choice
         
         attrs_a = {}
         attrs_b = {}
         
-        for attr in attributes:
-            levels = [level['level_id'] for level in attr.levels]
-            attrs_a[attr.attribute_key] = rng.choice(levels)
-            attrs_b[attr.attribute_key] = rng.choice(levels)
+        for key, levels in _level_table(tuple(attributes)):
+            attrs_a[key] = choice(levels)
+            attrs_b[key] = choice(levels)
         
         # Apply constraints
         attrs_a = self._apply_constraints(attrs_a)
@@ -224,59 +266,81 @@ class DOptimalStrategy(RandomizationStrategy):
     
     def __init__(self, history: List[Tuple[Dict, Dict]] = None):
         self.history = history or []
+        # Per attribute (aligned on _history_keys), how often each level
+        # appears across the cards in self.history; extended incrementally
+        self._history_keys = None
+        self._level_counts = []
+        self._history_cards = 0
+        self._history_seen = 0
     
-    def _calculate_diversity_score(self, attrs: Dict[str, str], 
-                                    history: List[Dict]) -> float:
-        """Calculate how different this combination is from history."""
-        if not history:
+    def _sync_level_counts(self, keys: tuple) -> None:
+        """Fold pairs added to history since the last call into the level counts."""
+        if keys != self._history_keys or self._history_seen > len(self.history):
+            self._history_keys = keys
+            self._level_counts = [Counter() for _ in keys]
+            self._history_cards = 0
+            self._history_seen = 0
+        
+        for pair in self.history[self._history_seen:]:
+            for attrs in pair:
+                for counts, key in zip(self._level_counts, keys):
+                    counts[attrs.get(key)] += 1
+                self._history_cards += 1
+        self._history_seen = len(self.history)
+    
+    def _history_matches(self, row: tuple) -> int:
+        """Total attribute matches between row and every card in history."""
+        return sum(counts[level] for counts, level in zip(self._level_counts, row))
+    
+    def _calculate_diversity_score(self, row: tuple) -> float:
+        """
+        Calculate how different this combination is from history: the mean,
+        over history cards, of the fraction of attributes that differ.
+        Read off the per-attribute level counts, so it costs O(attributes)
+        regardless of history length.
+        """
+        if not self._history_cards:
             return 1.0
-        
-        scores = []
-        for hist_attrs in history:
-            # Count matching attributes
-            matches = sum(1 for k, v in attrs.items() 
-                         if hist_attrs.get(k) == v)
-            scores.append(1 - (matches / len(attrs)))
-        
-        return sum(scores) / len(scores)
+        return 1 - self._history_matches(row) / (len(row) * self._history_cards)
     
     def generate_pair(self, attributes: List, round_number: int,
                       session_seed: str) -> Tuple[Dict[str, str], Dict[str, str]]:
-        rng = self._create_seeded_random(session_seed, round_number)
+        choice = self._create_seeded_random(session_seed, round_number).choice
+        table = _level_table(tuple(attributes))
+        keys = tuple(key for key, _ in table)
+        
+        self._sync_level_counts(keys)
         
-        # Generate multiple candidates and pick most diverse
+        # Generate multiple candidates and pick most diverse. Every candidate
+        # is scored against the same history, so the highest combined
+        # diversity score is the fewest total matches (compared exactly)
         best_pair = None
-        best_score = -1
+        best_matches = None
         
         for _ in range(10):  # Generate 10 candidates
-            attrs_a = {}
-            attrs_b = {}
+            row_a = []
+            row_b = []
             
-            for attr in attributes:
-                levels = [level['level_id'] for level in attr.levels]
-                attrs_a[attr.attribute_key] = rng.choice(levels)
-                attrs_b[attr.attribute_key] = rng.choice(levels)
+            for _, levels in table:
+                row_a.append(choice(levels))
+                row_b.append(choice(levels))
             
-            # Calculate combined diversity score
-            flat_history = [a for pair in self.history for a in pair]
-            score_a = self._calculate_diversity_score(attrs_a, flat_history)
-            score_b = self._calculate_diversity_score(attrs_b, flat_history)
-            combined_score = score_a + score_b
+            matches = self._history_matches(row_a) + self._history_matches(row_b)
             
-            if combined_score > best_score:
-                best_score = combined_score
-                best_pair = (attrs_a, attrs_b)
+            if best_matches is None or matches < best_matches:
+                best_matches = matches
+                best_pair = (row_a, row_b)
         
         if best_pair:
+            best_pair = (dict(zip(keys, best_pair[0])), dict(zip(keys, best_pair[1])))
             self.history.append(best_pair)
             return best_pair
         
         # Fallback to basic random
         attrs_a = {}
         attrs_b = {}
-        for attr in attributes:
-            levels = [level['level_id'] for level in attr.levels]
-            attrs_a[attr.attribute_key] = rng.choice(levels)
-            attrs_b[attr.attribute_key] = rng.choice(levels)
+        for key, levels in table:
+            attrs_a[key] = choice(levels)
+            attrs_b[key] = choice(levels)
         
         return attrs_a, attrs_b
@@ -1,24 +1,43 @@
 """
 API Routes - RESTful API endpoints for the conjoint experiment
 """
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from bson import ObjectId
+import random
+from threading import Lock
 
 from app.services.session_service import SessionService
 from app.services.conjoint_service import ConjointService
 from app.services.response_service import ResponseService
 from app.services.attribute_service import AttributeService
 from app.services.export_service import ExportService
+from app.json import dumps, iter_object, json_response
 
 api_bp = Blueprint('api', __name__)
 
+# Generic 500 body, encoded once; error details are only exposed in debug
+_INTERNAL_ERROR_BODY = dumps({'error': 'Internal server error'})
+
+# Exception types already logged once by this process
+_logged_error_types = set()
+_logged_error_types_lock = Lock()
+
 
 # Global error handler for API blueprint
 @api_bp.errorhandler(Exception)
 def handle_api_error(error):
     """Handle all API errors and return JSON response."""
-    current_app.logger.error(f"API Error: {str(error)}")
-    return jsonify({'error': str(error)}), 500
+    if current_app.debug:
+        current_app.logger.exception("API Error: %s", error)
+        return jsonify({'error': str(error)}), 500
+    
+    error_type = type(error)
+    with _logged_error_types_lock:
+        first_of_type = error_type not in _logged_error_types
+        _logged_error_types.add(error_type)
+    if first_of_type or random.random() < current_app.config.get('ERROR_LOG_SAMPLE_RATE', 1.0):
+        current_app.logger.exception("API Error: %s", error)
+    return Response(_INTERNAL_ERROR_BODY, status=500, mimetype='application/json')
 
 
 @api_bp.errorhandler(400)
@@ -64,7 +83,7 @@ def get_session_state(session_id):
         state = SessionService.get_session_state(session_id)
         if not state:
             return jsonify({'error': 'Session not found'}), 404
-        return jsonify(state)
+        return json_response(state)
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
@@ -108,23 +127,20 @@ def submit_response(session_id):
     if not validation['valid']:
         return jsonify({'error': validation['error']}), 400
     
-    # Normalize response
-    normalized = ResponseService.normalize_text_response(raw_input, question_id)
-    
-    # Save response
+    # Save response (normalized once, inside the service)
     response = ResponseService.save_response(
         session_id=session_id,
         question_id=question_id,
         question_type=question_type,
-        raw_input=raw_input,
-        normalized_value=normalized
+        raw_input=raw_input
     )
+    normalized = response.normalized_value
     
     # Handle special questions
     if question_id == 'email':
-        # Link user to session
-        name_response = ResponseService.get_response(session_id, 'name')
-        name = name_response.normalized_value if name_response else None
+        # Link user to session. The response map is memoized for the
+        # request, so formatting the next question reuses this read
+        name = ResponseService.get_response_map(session_id).get('name')
         
         SessionService.link_user_to_session(session_id, normalized, name)
     
@@ -133,7 +149,7 @@ def submit_response(session_id):
         session = SessionService.get_session(session_id)
         if session and session.user_id:
             from app.models.user import User
-            User.find_by_id(session.user_id).collection.update_one(
+            User.collection.update_one(
                 {'_id': session.user_id},
                 {'$set': {'zip_code': normalized}}
             )
@@ -148,6 +164,25 @@ def submit_response(session_id):
     })
 
 
+@api_bp.route('/session/<session_id>/responses', methods=['GET'])
+def get_session_responses(session_id):
+    """
+    Get all responses for a session, keyed by question id.
+    Streamed as they come off the cursor instead of built up front.
+    """
+    try:
+        responses = ResponseService.iter_all_responses(session_id)
+        if responses is None:
+            return jsonify({'error': 'Session not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return Response(
+        stream_with_context(iter_object(responses)),
+        mimetype='application/json'
+    )
+
+
 @api_bp.route('/session/<session_id>/complete', methods=['POST'])
 def complete_session(session_id):
     """Mark session as completed."""
@@ -169,10 +204,10 @@ def get_conjoint_round(session_id, round_number):
         Card A and Card B data with attributes
     """
     try:
-        cards = ConjointService.get_round_cards(session_id, round_number)
+        cards = ConjointService.get_round_cards_bytes(session_id, round_number)
         if not cards:
             return jsonify({'error': 'Session not found'}), 404
-        return jsonify(cards)
+        return Response(cards, mimetype='application/json')
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
@@ -230,29 +265,52 @@ def get_conjoint_results(session_id):
         results = ConjointService.get_session_results(session_id)
         if not results:
             return jsonify({'error': 'Session not found'}), 404
-        return jsonify(results)
+        return json_response(results)
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 
+@api_bp.route('/conjoint/<session_id>/results/stream', methods=['GET'])
+def stream_conjoint_results(session_id):
+    """
+    Stream a session's choices with their cards as NDJSON, one round per line.
+    Rows are encoded as they come off the aggregation cursor.
+    """
+    try:
+        rows = ConjointService.iter_session_choices(session_id)
+        if rows is None:
+            return jsonify({'error': 'Session not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return Response(
+        stream_with_context(dumps(row) + b'\n' for row in rows),
+        mimetype='application/x-ndjson'
+    )
+
+
 # ============== Attribute Endpoints ==============
 
 @api_bp.route('/attributes', methods=['GET'])
 def get_attributes():
-    """Get all job attribute definitions."""
+    """Get all job attribute definitions (served pre-encoded)."""
     try:
-        attributes = AttributeService.get_attributes_json()
-        return jsonify(attributes)
+        return Response(
+            AttributeService.get_attributes_json_bytes(),
+            mimetype='application/json'
+        )
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @api_bp.route('/attributes/statistics', methods=['GET'])
 def get_attribute_statistics():
-    """Get attribute statistics for experiment design."""
+    """Get attribute statistics for experiment design (served pre-encoded)."""
     try:
-        stats = AttributeService.get_attribute_statistics()
-        return jsonify(stats)
+        return Response(
+            AttributeService.get_attribute_statistics_bytes(),
+            mimetype='application/json'
+        )
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -307,7 +365,7 @@ def export_all():
 @api_bp.route('/export/formats', methods=['GET'])
 def get_export_formats():
     """Get available export formats."""
-    return jsonify(ExportService.get_available_formats())
+    return json_response(ExportService.get_available_formats())
 
 
 @api_bp.route('/export/statistics', methods=['GET'])
@@ -315,7 +373,7 @@ def get_statistics():
     """Get summary statistics for the experiment."""
     try:
         stats = ExportService.get_summary_statistics()
-        return jsonify(stats)
+        return json_response(stats)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -329,3 +387,13 @@ def health_check():
         'status': 'healthy',
         'service': 'Jack & Jill Conjoint Experiment API'
     })
+
+
+@api_bp.route('/health/db', methods=['GET'])
+def database_health_check():
+    """Readiness check that round-trips to MongoDB."""
+    from app import ping_db
+    
+    if not ping_db():
+        return jsonify({'status': 'unavailable'}), 503
+    return jsonify({'status': 'ready'})
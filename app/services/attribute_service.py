@@ -1,9 +1,17 @@
 """
 Attribute Service - Manages job attributes for conjoint analysis
 """
-from typing import List, Dict, Any, Optional
+import logging
+from math import prod
+from threading import RLock
+from time import monotonic
+from typing import List, Dict, Any, Optional, Tuple
+from pymongo.errors import DuplicateKeyError
 from app.models.job_attribute import JobAttribute, DEFAULT_JOB_ATTRIBUTES
-from app import mongo, get_db
+from app import get_db
+from app.json import dumps
+
+logger = logging.getLogger(__name__)
 
 
 class AttributeService:
@@ -12,8 +20,24 @@ class AttributeService:
     Implements Singleton pattern for attribute caching with lazy initialization.
     """
     
+    # Edits made by other worker processes become visible after this long
+    CACHE_TTL_SECONDS = 300
+    
     _initialized = False
     _cached_attributes = None
+    # monotonic() deadline after which the cached attributes are reloaded
+    _cache_expires_at = 0.0
+    # (attribute list, its to_json() payload, that payload encoded):
+    # rebuilt only when the list changes
+    _cached_attributes_json = None
+    # (attribute list, {frozenset of keys: ordered subset}), same lifetime
+    _cached_subsets = None
+    # (attribute list, {attribute_key: attribute}), same lifetime
+    _cached_attribute_map = None
+    # (attribute list, get_attribute_statistics() result, that result
+    # encoded), same lifetime
+    _cached_statistics = None
+    _cache_lock = RLock()
     
     @classmethod
     def initialize_default_attributes(cls) -> bool:
@@ -23,35 +47,31 @@ class AttributeService:
         
         Returns True if successful.
         """
-        try:
-            db = get_db()
-            if db is None:
-                print("⏳ MongoDB not ready, deferring attribute initialization")
+        # One thread seeds at a time; re-entrant because _load_attributes
+        # calls this while already holding the lock
+        with cls._cache_lock:
+            try:
+                db = get_db()
+                if db is None:
+                    logger.info("⏳ MongoDB not ready, deferring attribute initialization")
+                    return False
+                
+                # Idempotent seed: one batched round-trip, existing attributes untouched
+                inserted = JobAttribute.seed_defaults()
+                
+                if inserted:
+                    logger.info("✓ Initialized %d default job attributes", inserted)
+                else:
+                    logger.info("✓ Found all %d default job attributes", len(DEFAULT_JOB_ATTRIBUTES))
+                
+                cls._initialized = True
+                cls._cached_attributes = None  # Clear cache to reload
+                return True
+                
+            except Exception as e:
+                logger.error("✗ Failed to initialize attributes: %s", e)
+                cls._initialized = False
                 return False
-            
-            # Check if attributes already exist
-            existing_count = db.job_attributes.count_documents({})
-            
-            if existing_count == 0:
-                # Seed default attributes
-                for attr_data in DEFAULT_JOB_ATTRIBUTES:
-                    db.job_attributes.insert_one({
-                        'attribute_key': attr_data['attribute_key'],
-                        'display_name': attr_data['display_name'],
-                        'levels': attr_data['levels']
-                    })
-                print(f"✓ Initialized {len(DEFAULT_JOB_ATTRIBUTES)} default job attributes")
-            else:
-                print(f"✓ Found {existing_count} existing job attributes")
-            
-            cls._initialized = True
-            cls._cached_attributes = None  # Clear cache to reload
-            return True
-            
-        except Exception as e:
-            print(f"✗ Failed to initialize attributes: {e}")
-            cls._initialized = False
-            return False
     
     @classmethod
     def ensure_initialized(cls) -> bool:
@@ -59,21 +79,36 @@ class AttributeService:
         Ensure attributes are initialized. Can be called at runtime.
         Returns True if attributes exist and are accessible.
         """
-        if not cls._initialized:
+        if cls._initialized:
+            return True
+        
+        with cls._cache_lock:
+            if cls._initialized:
+                return True
             return cls.initialize_default_attributes()
-        return True
     
     @classmethod
-    def get_all_attributes(cls) -> List[JobAttribute]:
+    def get_all_attributes(cls) -> Tuple[JobAttribute, ...]:
         """
         Get all attribute definitions with lazy initialization and caching.
         Ensures attributes are seeded if database is empty.
         Raises RuntimeError if no attributes can be loaded.
         """
         # Check cache first
-        if cls._cached_attributes is not None and cls._initialized:
-            return cls._cached_attributes
+        attributes = cls._cached_attributes
+        if attributes is not None and cls._initialized and monotonic() < cls._cache_expires_at:
+            return attributes
         
+        # One thread loads on a miss; the others wait and reuse its result
+        with cls._cache_lock:
+            attributes = cls._cached_attributes
+            if attributes is not None and cls._initialized and monotonic() < cls._cache_expires_at:
+                return attributes
+            return cls._load_attributes()
+    
+    @classmethod
+    def _load_attributes(cls) -> Tuple[JobAttribute, ...]:
+        """Load attributes from MongoDB into the cache. Caller holds the lock."""
         # Ensure database is accessible
         db = get_db()
         if db is None:
@@ -82,14 +117,12 @@ class AttributeService:
                 "Please check your MONGO_URI configuration."
             )
         
-        # Check if we need to seed
-        existing_count = db.job_attributes.count_documents({})
-        if existing_count == 0:
-            print("⚡ Lazy-initializing job attributes on first access")
-            cls.initialize_default_attributes()
-        
-        # Load from database
+        # Load from database, seeding only if nothing is there yet
         attributes = JobAttribute.get_all_attributes()
+        if not attributes:
+            logger.info("⚡ Lazy-initializing job attributes on first access")
+            cls.initialize_default_attributes()
+            attributes = JobAttribute.get_all_attributes()
         
         if not attributes:
             raise RuntimeError(
@@ -97,20 +130,87 @@ class AttributeService:
                 "Please check MongoDB connection and seed data."
             )
         
+        # Immutable, so callers can key caches on it (tuple() of it is free)
+        attributes = tuple(attributes)
         cls._cached_attributes = attributes
+        cls._cache_expires_at = monotonic() + cls.CACHE_TTL_SECONDS
         cls._initialized = True
         return attributes
     
+    @classmethod
+    def invalidate_cache(cls):
+        """Drop cached attribute definitions so the next read reloads them."""
+        cls._cached_attributes = None
+    
+    @classmethod
+    def get_attribute_subset(cls, attribute_keys) -> Tuple[JobAttribute, ...]:
+        """
+        Get the definitions for the given keys, in definition order.
+        Each subset is filtered once per loaded attribute set.
+        """
+        attributes = cls.get_all_attributes()
+        
+        cached = cls._cached_subsets
+        if cached is None or cached[0] is not attributes:
+            cached = cls._cached_subsets = (attributes, {})
+        
+        keys = frozenset(attribute_keys)
+        subset = cached[1].get(keys)
+        if subset is None:
+            subset = tuple(a for a in attributes if a.attribute_key in keys)
+            cached[1][keys] = subset
+        return subset
+    
+    @classmethod
+    def get_attribute_map(cls) -> Dict[str, JobAttribute]:
+        """
+        Get all attributes keyed by attribute_key.
+        Built once per loaded attribute set; callers must not mutate it.
+        """
+        attributes = cls.get_all_attributes()
+        
+        cached = cls._cached_attribute_map
+        if cached is None or cached[0] is not attributes:
+            cached = (attributes, {a.attribute_key: a for a in attributes})
+            cls._cached_attribute_map = cached
+        return cached[1]
+    
     @classmethod
     def get_attribute(cls, attribute_key: str) -> Optional[JobAttribute]:
-        """Get a specific attribute by key."""
-        return JobAttribute.find_by_key(attribute_key)
+        """
+        Get a specific attribute by key. Served from the cached definitions;
+        a key they lack (e.g. added by another worker) is read from MongoDB,
+        and when found there the cache is dropped so the next read reloads.
+        """
+        attr = cls.get_attribute_map().get(attribute_key)
+        if attr is None:
+            attr = JobAttribute.find_by_key(attribute_key)
+            if attr is not None:
+                cls.invalidate_cache()
+        return attr
     
     @classmethod
     def get_attributes_json(cls) -> List[Dict[str, Any]]:
         """Get all attributes as JSON-serializable list."""
+        return cls._attributes_json_entry()[1]
+    
+    @classmethod
+    def get_attributes_json_bytes(cls) -> bytes:
+        """Get all attributes as an encoded JSON array, ready to send."""
+        return cls._attributes_json_entry()[2]
+    
+    @classmethod
+    def _attributes_json_entry(cls) -> tuple:
+        """(attributes, JSON payload, encoded payload) for the current attribute set."""
         attributes = cls.get_all_attributes()
-        return [attr.to_json() for attr in attributes]
+        
+        # Ids and timestamps are formatted (and encoded) once per loaded attribute set
+        cached = cls._cached_attributes_json
+        if cached is None or cached[0] is not attributes:
+            payload = [attr.to_json() for attr in attributes]
+            cached = (attributes, payload, dumps(payload))
+            cls._cached_attributes_json = cached
+        return cached
     
     @classmethod
     def add_attribute(cls, attribute_key: str, display_name: str,
@@ -131,17 +231,23 @@ class AttributeService:
             if 'level_id' not in level or 'display_text' not in level:
                 raise ValueError("Each level must have 'level_id' and 'display_text'")
         
-        # Check for existing
-        existing = JobAttribute.find_by_key(attribute_key)
-        if existing:
-            raise ValueError(f"Attribute '{attribute_key}' already exists")
+        # The unique attribute_key index rejects duplicates in the same
+        # round-trip as the insert, with no check-then-save race. Until it is
+        # confirmed built, check first as well.
+        if not JobAttribute.indexes_ready():
+            if JobAttribute.find_by_key(attribute_key, projection={'_id': 1}):
+                raise ValueError(f"Attribute '{attribute_key}' already exists")
         
         attr = JobAttribute(
             attribute_key=attribute_key,
             display_name=display_name,
             levels=levels
         )
-        attr.save()
+        try:
+            attr.save()
+        except DuplicateKeyError:
+            raise ValueError(f"Attribute '{attribute_key}' already exists")
+        cls.invalidate_cache()
         return attr
     
     @classmethod
@@ -160,30 +266,44 @@ class AttributeService:
             if 'level_id' not in level or 'display_text' not in level:
                 raise ValueError("Each level must have 'level_id' and 'display_text'")
         
-        attr.collection.update_one(
+        JobAttribute.collection.update_one(
             {'attribute_key': attribute_key},
             {'$set': {'levels': levels}}
         )
         attr.levels = levels
+        cls.invalidate_cache()
         return attr
     
     @classmethod
     def get_attribute_statistics(cls) -> Dict[str, Any]:
         """
         Get statistics about attributes (useful for experiment design).
+        Computed once per loaded attribute set.
         """
+        return cls._statistics_entry()[1]
+    
+    @classmethod
+    def get_attribute_statistics_bytes(cls) -> bytes:
+        """Get the attribute statistics as encoded JSON, ready to send."""
+        return cls._statistics_entry()[2]
+    
+    @classmethod
+    def _statistics_entry(cls) -> tuple:
+        """(attributes, statistics, encoded statistics) for the current attribute set."""
         attributes = cls.get_all_attributes()
         
-        total_combinations = 1
-        for attr in attributes:
-            total_combinations *= len(attr.levels)
+        cached = cls._cached_statistics
+        if cached is not None and cached[0] is attributes:
+            return cached
         
-        return {
+        statistics = {
             'attribute_count': len(attributes),
-            'total_possible_combinations': total_combinations,
+            'total_possible_combinations': prod(len(attr.levels) for attr in attributes),
             'attributes': [{
                 'key': attr.attribute_key,
                 'name': attr.display_name,
                 'level_count': len(attr.levels)
             } for attr in attributes]
         }
+        cached = cls._cached_statistics = (attributes, statistics, dumps(statistics))
+        return cached
@@ -2,15 +2,24 @@
 Conjoint Service - Manages conjoint experiment logic
 Implements Strategy pattern coordination for job card generation
 """
-from typing import Dict, Any, List, Optional, Tuple
+import logging
+from collections import OrderedDict
+from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from threading import BoundedSemaphore, Lock
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from bson import ObjectId
 from flask import current_app
+from pymongo.errors import DuplicateKeyError
 
 from app.models.chat_session import ChatSession
 from app.models.generated_job_card import GeneratedJobCard
 from app.models.conjoint_choice import ConjointChoice
 from app.models.job_attribute import JobAttribute
 from app.services.attribute_service import AttributeService
+from app.services.request_cache import request_cache
+from app.json import dumps
 from app.patterns.factory import JobCardFactory
 from app.patterns.strategy import (
     SeededRandomStrategy,
@@ -18,6 +27,17 @@ from app.patterns.strategy import (
     FullFactorialStrategy
 )
 
+logger = logging.getLogger(__name__)
+
+# Background workers for card pre-generation (shared by the whole process).
+# At most PREGENERATION_MAX_PENDING jobs are queued or running; beyond that
+# sessions are not scheduled and their rounds are generated on demand
+PREGENERATION_MAX_PENDING = 64
+_pregeneration_executor = ThreadPoolExecutor(
+    max_workers=2, thread_name_prefix='conjoint-pregen'
+)
+_pregeneration_slots = BoundedSemaphore(PREGENERATION_MAX_PENDING)
+
 
 class ConjointService:
     """
@@ -32,6 +52,21 @@ class ConjointService:
         'factorial': FullFactorialStrategy
     }
     
+    # One shared service (strategy + factory) per strategy name, used by
+    # every request thread and the pre-generation workers. The registered
+    # strategies are stateless and the factory keeps no per-call state
+    # (each card pair gets its own builder), so instances are reusable
+    _instances = {}
+    
+    # Formatted round responses and their encoding, LRU by (session ObjectId,
+    # round_number). Cards never change once created, so entries only go
+    # stale if the attribute definitions they were formatted with are
+    # reloaded; each entry keeps that attribute map and is ignored once it
+    # is no longer current.
+    ROUND_CACHE_SIZE = 1024
+    _round_cache = OrderedDict()
+    _round_cache_lock = Lock()
+    
     def __init__(self, strategy_name: str = 'balanced'):
         """
         Initialize conjoint service with specified strategy.
@@ -43,6 +78,70 @@ class ConjointService:
         self.strategy = strategy_class()
         self.factory = JobCardFactory(self.strategy)
     
+    @classmethod
+    def get_instance(cls, strategy_name: str = 'balanced') -> 'ConjointService':
+        """Get the process-wide service for a strategy, creating it on first use."""
+        # Unknown names fall back to balanced; share that instance rather
+        # than caching one per name, so the registry stays bounded
+        if strategy_name not in cls.STRATEGIES:
+            strategy_name = 'balanced'
+        
+        service = cls._instances.get(strategy_name)
+        if service is None:
+            service = cls._instances.setdefault(strategy_name, cls(strategy_name))
+        return service
+    
+    @classmethod
+    def schedule_pregeneration(cls, session_id: ObjectId, session_seed: str,
+                               first_round: int = 1):
+        """
+        Generate and save the cards for rounds first_round onwards off the
+        request thread, so round requests only have to read them back.
+        Pre-generated cards are not marked shown until a round request
+        serves them. Skipped (returns None) when disabled or backed up.
+        """
+        config = current_app.config
+        if not config.get('CONJOINT_PREGENERATE'):
+            return None
+        
+        total_rounds = config['CONJOINT_ROUNDS']
+        if first_round > total_rounds:
+            return None
+        
+        if not _pregeneration_slots.acquire(blocking=False):
+            return None
+        try:
+            future = _pregeneration_executor.submit(
+                cls._pregenerate_rounds, session_id, session_seed,
+                first_round, total_rounds
+            )
+        except RuntimeError:
+            # Executor shut down (interpreter exit)
+            _pregeneration_slots.release()
+            return None
+        future.add_done_callback(lambda _: _pregeneration_slots.release())
+        return future
+    
+    @classmethod
+    def _pregenerate_rounds(cls, session_id: ObjectId, session_seed: str,
+                            first_round: int, total_rounds: int) -> int:
+        """
+        Create the card pairs for rounds first_round..total_rounds and save
+        them in one insert. Rounds an on-demand request already stored are
+        skipped.
+        """
+        try:
+            factory = cls.get_instance().factory
+            cards = []
+            for round_number in range(first_round, total_rounds + 1):
+                cards.extend(factory.create_card_pair(session_id, round_number, session_seed))
+            GeneratedJobCard.save_new(cards)
+            return len(cards)
+        except Exception:
+            # The round endpoint still generates on demand
+            logger.exception("⚠️ Card pre-generation failed for session %s", session_id)
+            return 0
+    
     @classmethod
     def get_round_cards(cls, session_id: str, round_number: int) -> Dict[str, Any]:
         """
@@ -53,40 +152,82 @@ class ConjointService:
             round_number: Round number (1-indexed)
         
         Returns:
-            Dictionary with card_a and card_b data
+            Dictionary with card_a and card_b data (the caller's own copy)
         """
-        session = ChatSession.find_by_id(ObjectId(session_id))
-        if not session:
-            return None
+        entry = cls._round_entry(session_id, round_number)
+        return deepcopy(entry[1]) if entry else None
+    
+    @classmethod
+    def get_round_cards_bytes(cls, session_id: str, round_number: int) -> Optional[bytes]:
+        """Get a round's cards as encoded JSON, ready to send."""
+        entry = cls._round_entry(session_id, round_number)
+        return entry[2] if entry else None
+    
+    @classmethod
+    def invalidate_round_cache(cls, session_id: str):
+        """Drop a session's cached rounds."""
+        session_id = ObjectId(session_id)
+        with cls._round_cache_lock:
+            for key in [k for k in cls._round_cache if k[0] == session_id]:
+                del cls._round_cache[key]
+    
+    @classmethod
+    def _round_entry(cls, session_id: str, round_number: int) -> Optional[tuple]:
+        """(attribute map, round response, encoded response), or None if no session."""
+        # Get attribute definitions for display (via AttributeService for initialization safety)
+        attr_map = AttributeService.get_attribute_map()
+        
+        # Repeat loads of a round (e.g. page refreshes) skip MongoDB entirely
+        session_id = ObjectId(session_id)
+        cache_key = (session_id, round_number)
+        with cls._round_cache_lock:
+            cached = cls._round_cache.get(cache_key)
+            if cached is not None and cached[0] is attr_map:
+                cls._round_cache.move_to_end(cache_key)
+                return cached
         
-        # Check for existing cards
-        existing_cards = GeneratedJobCard.find_by_round(
-            ObjectId(session_id), round_number
+        # Session and any existing cards for the round in one round-trip
+        session, existing_cards = ChatSession.find_with_round_cards(
+            session_id, round_number
         )
+        if not session:
+            return None
         
-        if len(existing_cards) == 2:
-            # Return existing cards
-            card_a = next((c for c in existing_cards if c.card_label == 'A'), None)
-            card_b = next((c for c in existing_cards if c.card_label == 'B'), None)
-        else:
-            # Generate new cards
-            service = cls()
-            card_a, card_b = service.factory.create_and_save_card_pair(
-                ObjectId(session_id),
-                round_number,
-                session.session_seed
+        if len(existing_cards) < 2:
+            # Generate new cards, shown as of now
+            card_a, card_b = cls.get_instance().factory.create_card_pair(
+                session.id, round_number, session.session_seed
             )
+            card_a.shown_at = card_b.shown_at = datetime.utcnow()
+            if not GeneratedJobCard.save_new([card_a, card_b]):
+                # Pre-generation or a concurrent request stored the round
+                # first (unique index); serve the stored cards instead
+                existing_cards = GeneratedJobCard.find_by_round(session.id, round_number)
         
-        # Get attribute definitions for display (via AttributeService for initialization safety)
-        attributes = AttributeService.get_all_attributes()
-        attr_map = {a.attribute_key: a for a in attributes}
+        if len(existing_cards) >= 2:
+            # Return existing cards
+            by_label = {c.card_label: c for c in existing_cards}
+            card_a = by_label.get('A')
+            card_b = by_label.get('B')
+            
+            # First serve of pre-generated cards records the exposure
+            if card_a.shown_at is None or card_b.shown_at is None:
+                GeneratedJobCard.mark_shown(session.id, round_number)
         
-        return {
+        result = {
             'round_number': round_number,
             'total_rounds': current_app.config['CONJOINT_ROUNDS'],
             'card_a': cls._format_card(card_a, attr_map),
             'card_b': cls._format_card(card_b, attr_map)
         }
+        
+        entry = (attr_map, result, dumps(result))
+        with cls._round_cache_lock:
+            cls._round_cache[cache_key] = entry
+            cls._round_cache.move_to_end(cache_key)
+            if len(cls._round_cache) > cls.ROUND_CACHE_SIZE:
+                cls._round_cache.popitem(last=False)
+        return entry
     
     @classmethod
     def _format_card(cls, card: GeneratedJobCard, 
@@ -108,7 +249,8 @@ class ConjointService:
             'id': str(card.id),
             'label': card.card_label,
             'attributes': attributes,
-            'rendered_text': card.rendered_text
+            'rendered_text': card.rendered_text,
+            'rendered_html': card.rendered_html
         }
     
     @classmethod
@@ -130,29 +272,44 @@ class ConjointService:
         if choice not in ('A', 'B'):
             raise ValueError("Choice must be 'A' or 'B'")
         
-        # Check if choice already recorded
-        existing = ConjointChoice.get_choice(ObjectId(session_id), round_number)
-        if existing:
-            return {
-                'error': 'Choice already recorded for this round',
-                'existing_choice': existing.choice
-            }
+        session_id = ObjectId(session_id)
+        
+        # The unique (session_id, round_number) index rejects a second choice
+        # for the round in the same write. Until it is confirmed built (it
+        # cannot be while legacy duplicates exist), check first as well.
+        if not ConjointChoice.indexes_ready():
+            existing = ConjointChoice.get_choice(session_id, round_number)
+            if existing:
+                return {
+                    'error': 'Choice already recorded for this round',
+                    'existing_choice': existing.choice
+                }
         
         # Record choice (immutable)
         conjoint_choice = ConjointChoice(
-            session_id=ObjectId(session_id),
+            session_id=session_id,
             round_number=round_number,
             choice=choice,
             response_time_ms=response_time_ms
         )
-        conjoint_choice.save()
+        try:
+            conjoint_choice.save()
+        except DuplicateKeyError:
+            existing = ConjointChoice.get_choice(session_id, round_number)
+            return {
+                'error': 'Choice already recorded for this round',
+                'existing_choice': existing.choice if existing else None
+            }
         
-        # Update session round progress
-        session = ChatSession.find_by_id(ObjectId(session_id))
         total_rounds = current_app.config['CONJOINT_ROUNDS']
         
-        # Always update session's current_round to track progress
-        session.update_progress('conjoint', round_number)
+        # Always update session's current_round to track progress. This is
+        # also the session existence check: a choice for an unknown session
+        # is taken back rather than read the session up front.
+        if not ChatSession.set_progress(session_id, 'conjoint', round_number):
+            ConjointChoice.collection.delete_one({'_id': conjoint_choice.id})
+            raise ValueError("Session not found")
+        request_cache('_sessions').pop(session_id, None)
         
         if round_number >= total_rounds:
             # Conjoint complete - advance session to next step (completion)
@@ -181,7 +338,7 @@ class ConjointService:
         if not session:
             return None
         
-        choices = ConjointChoice.get_all_choices_with_cards(ObjectId(session_id))
+        choices = list(ConjointChoice.get_all_choices_with_cards(session.id))
         
         return {
             'session_id': session_id,
@@ -191,36 +348,37 @@ class ConjointService:
             'choices': choices
         }
     
+    @classmethod
+    def iter_session_choices(cls, session_id: str) -> Optional[Iterator[Dict]]:
+        """
+        Lazily yield a session's choices joined with their cards.
+        Returns None if the session does not exist.
+        """
+        session = ChatSession.find_by_id(ObjectId(session_id))
+        if not session:
+            return None
+        
+        return ConjointChoice.get_all_choices_with_cards(session.id)
+    
     @classmethod
     def get_analysis_data(cls, session_ids: List[str] = None) -> List[Dict]:
         """
         Get data formatted for conjoint analysis.
         Returns flattened records suitable for logit/probit models.
         """
-        from app import mongo
-        
-        # Build query
-        query = {}
-        if session_ids:
-            query['session_id'] = {'$in': [ObjectId(sid) for sid in session_ids]}
-        
-        # Get all choices
-        choices = list(mongo.db.conjoint_choices.find(query))
-        
-        analysis_data = []
-        
-        for choice in choices:
+        return list(cls.iter_analysis_data(session_ids))
+    
+    @classmethod
+    def iter_analysis_data(cls, session_ids: List[str] = None) -> Iterator[Dict]:
+        """Lazily yield the get_analysis_data records, one per choice."""
+        # Choices arrive already joined with their cards (one aggregation)
+        for choice in ConjointChoice.iter_choices_with_cards(session_ids):
             session_id = choice['session_id']
             round_num = choice['round_number']
             
-            # Get corresponding cards
-            cards = list(mongo.db.generated_job_cards.find({
-                'session_id': session_id,
-                'round_number': round_num
-            }))
-            
-            card_a = next((c for c in cards if c['card_label'] == 'A'), None)
-            card_b = next((c for c in cards if c['card_label'] == 'B'), None)
+            by_label = {c['card_label']: c for c in choice['cards']}
+            card_a = by_label.get('A')
+            card_b = by_label.get('B')
             
             if card_a and card_b:
                 # Create analysis record
@@ -241,6 +399,4 @@ class ConjointService:
                 for key, value in card_b['attributes'].items():
                     record[f'b_{key}'] = value
                 
-                analysis_data.append(record)
-        
-        return analysis_data
+                yield record
@@ -2,14 +2,35 @@
 Export Service - Handles data export for analysis
 Uses Adapter pattern for format conversion
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Union
 from bson import ObjectId
 from flask import Response
 
+from app import get_db
+from app.models.chat_session import SessionStatus
 from app.services.conjoint_service import ConjointService
 from app.patterns.adapter import ExportAdapterFactory
 
 
+# Streamed exports are sent in chunks of about this many characters
+_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _buffered(chunks: Iterable[str], size: int = _STREAM_CHUNK_SIZE) -> Iterator[str]:
+    """Coalesce small text chunks (e.g. one per row) into larger writes."""
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield ''.join(buffer)
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
 class ExportService:
     """
     Service for exporting experiment data to various formats.
@@ -37,7 +58,7 @@ class ExportService:
     
     @classmethod
     def export_all_data(cls, format_type: str = 'csv',
-                        session_ids: List[str] = None) -> str:
+                        session_ids: List[str] = None) -> Iterator[str]:
         """
         Export data for multiple or all sessions.
         
@@ -46,21 +67,23 @@ class ExportService:
             session_ids: Optional list of specific sessions
         
         Returns:
-            Formatted export string
+            Formatted export as an iterator of text chunks, produced as
+            records stream off the database cursor
         """
-        data = ConjointService.get_analysis_data(session_ids)
-        
+        # Created eagerly so an unknown format fails before streaming starts
         adapter = ExportAdapterFactory.create(format_type)
-        return adapter.export(data)
+        
+        data = ConjointService.iter_analysis_data(session_ids)
+        return _buffered(adapter.stream(data))
     
     @classmethod
-    def export_to_response(cls, data: str, format_type: str,
+    def export_to_response(cls, data: Union[str, Iterable[str]], format_type: str,
                            filename: str = 'conjoint_data') -> Response:
         """
         Create a Flask Response for file download.
         
         Args:
-            data: Exported data string
+            data: Exported data string, or an iterator of chunks to stream
             format_type: Export format
             filename: Base filename without extension
         
@@ -88,54 +111,67 @@ class ExportService:
         """
         Get summary statistics for analysis.
         """
-        from app import mongo
-        from app.models.chat_session import SessionStatus
+        db = get_db()
         
         # Build query
         session_query = {}
         if session_ids:
             session_query['_id'] = {'$in': [ObjectId(sid) for sid in session_ids]}
         
-        # Count sessions by status
-        total_sessions = mongo.db.chat_sessions.count_documents(session_query)
-        completed_sessions = mongo.db.chat_sessions.count_documents({
+        # Count sessions by status (unfiltered totals come from metadata)
+        if session_query:
+            total_sessions = db.chat_sessions.count_documents(session_query)
+        else:
+            total_sessions = db.chat_sessions.estimated_document_count()
+        completed_sessions = db.chat_sessions.count_documents({
             **session_query,
             'status': SessionStatus.COMPLETED.value
         })
         
-        # Count total choices
+        # Choice count, distribution and response times in one pass
         choice_query = {}
         if session_ids:
             choice_query['session_id'] = {'$in': [ObjectId(sid) for sid in session_ids]}
-        total_choices = mongo.db.conjoint_choices.count_documents(choice_query)
         
-        # Get choice distribution
         pipeline = [
-            {'$match': choice_query} if choice_query else {'$match': {}},
-            {'$group': {
-                '_id': '$choice',
-                'count': {'$sum': 1}
+            {'$match': choice_query},
+            {'$facet': {
+                'total': [{'$count': 'count'}],
+                # Folded server-side into one {choice: count} document;
+                # $arrayToObject needs string keys, so stray values are left out
+                'by_choice': [
+                    {'$match': {'choice': {'$in': ['A', 'B']}}},
+                    {'$group': {
+                        '_id': '$choice',
+                        'count': {'$sum': 1}
+                    }},
+                    {'$group': {
+                        '_id': None,
+                        'distribution': {'$push': {'k': '$_id', 'v': '$count'}}
+                    }},
+                    {'$replaceRoot': {'newRoot': {'$arrayToObject': '$distribution'}}}
+                ],
+                'response_time': [{'$group': {
+                    '_id': None,
+                    'avg_response_time': {'$avg': '$response_time_ms'},
+                    'min_response_time': {'$min': '$response_time_ms'},
+                    'max_response_time': {'$max': '$response_time_ms'}
+                }}]
             }}
         ]
-        choice_dist = list(mongo.db.conjoint_choices.aggregate(pipeline))
+        facets = next(db.conjoint_choices.aggregate(pipeline), None) or {}
         
-        # Average response time
-        pipeline = [
-            {'$match': choice_query} if choice_query else {'$match': {}},
-            {'$group': {
-                '_id': None,
-                'avg_response_time': {'$avg': '$response_time_ms'},
-                'min_response_time': {'$min': '$response_time_ms'},
-                'max_response_time': {'$max': '$response_time_ms'}
-            }}
-        ]
-        response_time_stats = list(mongo.db.conjoint_choices.aggregate(pipeline))
+        total = facets.get('total')
+        total_choices = total[0]['count'] if total else 0
+        by_choice = facets.get('by_choice')
+        choice_distribution = by_choice[0] if by_choice else {}
+        response_time_stats = facets.get('response_time', [])
         
         return {
             'total_sessions': total_sessions,
             'completed_sessions': completed_sessions,
             'completion_rate': completed_sessions / total_sessions if total_sessions > 0 else 0,
             'total_choices': total_choices,
-            'choice_distribution': {item['_id']: item['count'] for item in choice_dist},
+            'choice_distribution': choice_distribution,
             'response_time_stats': response_time_stats[0] if response_time_stats else {}
         }
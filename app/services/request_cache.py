@@ -0,0 +1,19 @@
+"""
+Request Cache - Per-request memoization for service lookups
+"""
+from flask import g, has_app_context
+
+
+def request_cache(name: str) -> dict:
+    """
+    Get the memo dict called name for the current request (stored on flask.g).
+    Outside an app context a fresh, throwaway dict is returned.
+    """
+    if not has_app_context():
+        return {}
+    
+    cache = g.get(name)
+    if cache is None:
+        cache = {}
+        setattr(g, name, cache)
+    return cache
@@ -1,11 +1,23 @@
 """
 Response Service - Handles user response collection and processing
 """
-from typing import Dict, Any, Optional
+import re
+from operator import itemgetter
+from typing import Dict, Any, Iterator, Optional, Tuple
 from bson import ObjectId
 
 from app.models.user_response import UserResponse
 from app.models.chat_session import ChatSession
+from app.models.base import as_object_id
+from app.services.request_cache import request_cache
+
+# Compiled once at import; both run on every submitted answer. The email
+# pattern accepts what the original check did: an '@' and a '.' anywhere
+_EMAIL_RE = re.compile(r'(?=.*@)(?=.*\.)', re.DOTALL)
+_NON_DIGITS_RE = re.compile(r'\D+')
+
+# (question_id, normalized_value) from a raw response document, in C
+_ANSWER_ITEM = itemgetter('question_id', 'normalized_value')
 
 
 class ResponseService:
@@ -26,44 +38,75 @@ class ResponseService:
             question_id: Question identifier
             question_type: Type of question (text, choice, number)
             raw_input: Raw user input
-            normalized_value: Optional normalized/processed value
+            normalized_value: Optional normalized/processed value; computed
+                with normalize_text_response when omitted
         
         Returns:
             Saved UserResponse object
         """
-        # Check for existing response
-        existing = UserResponse.get_response(ObjectId(session_id), question_id)
-        if existing:
-            # Responses are immutable - return existing
-            return existing
+        session_id = as_object_id(session_id)
+        if normalized_value is None:
+            normalized_value = cls.normalize_text_response(raw_input, question_id)
         
-        # Create new response
         response = UserResponse(
-            session_id=ObjectId(session_id),
+            session_id=session_id,
             question_id=question_id,
             question_type=question_type,
             raw_input=raw_input,
-            normalized_value=normalized_value or raw_input
+            normalized_value=normalized_value
         )
-        response.save()
+        
+        # Responses are immutable: an existing answer is returned untouched
+        response, created = response.save_if_absent()
+        if created:
+            request_cache('_response_maps').pop(session_id, None)
         
         return response
     
     @classmethod
-    def get_response(cls, session_id: str, question_id: str) -> Optional[UserResponse]:
+    def get_response_map(cls, session_id: str) -> Dict[str, Any]:
+        """
+        Get {question_id: normalized_value} for a session, in answer order.
+        Memoized for the rest of the request; saving a response drops it.
+        """
+        session_id = as_object_id(session_id)
+        cache = request_cache('_response_maps')
+        
+        response_map = cache.get(session_id)
+        if response_map is None:
+            docs = UserResponse.projected_by_session(
+                session_id, ('question_id', 'normalized_value')
+            )
+            response_map = cache[session_id] = cls.response_map_from_docs(docs)
+        return response_map
+    
+    @staticmethod
+    def response_map_from_docs(docs) -> Dict[str, Any]:
+        """{question_id: normalized_value} from raw response documents."""
+        return dict(map(_ANSWER_ITEM, docs))
+    
+    @classmethod
+    def get_response(cls, session_id: str, question_id: str,
+                     projection: dict = None) -> Optional[UserResponse]:
         """Get a specific response."""
-        return UserResponse.get_response(ObjectId(session_id), question_id)
+        return UserResponse.get_response(ObjectId(session_id), question_id, projection)
     
     @classmethod
-    def get_all_responses(cls, session_id: str) -> Dict[str, Any]:
-        """Get all responses for a session as a dictionary."""
-        responses = UserResponse.find_by_session(ObjectId(session_id))
-        return {r.question_id: {
-            'raw_input': r.raw_input,
-            'normalized_value': r.normalized_value,
-            'question_type': r.question_type,
-            'timestamp': r.timestamp.isoformat() if r.timestamp else None
-        } for r in responses}
+    def iter_all_responses(cls, session_id: str) -> Optional[Iterator[Tuple[str, Dict[str, Any]]]]:
+        """
+        Lazily yield a session's (question_id, details) pairs, in answer
+        order, straight off the cursor.
+        Returns None if the session does not exist.
+        """
+        session_id = ObjectId(session_id)
+        if not ChatSession.find_one({'_id': session_id}, projection={'_id': 1}):
+            return None
+        
+        # Raw projected documents; no model objects
+        docs = UserResponse.projected_by_session(session_id, (
+            'question_id', 'raw_input', 'normalized_value', 'question_type', 'timestamp'
+        ))
+        return ((doc.pop('question_id'), doc) for doc in docs)
     
     @classmethod
     def normalize_text_response(cls, raw_input: str, question_id: str) -> str:
@@ -79,7 +122,7 @@ class ResponseService:
             normalized = normalized.lower()
         elif question_id == 'zip_code':
             # Extract numeric portion
-            normalized = ''.join(c for c in normalized if c.isdigit())[:5]
+            normalized = _NON_DIGITS_RE.sub('', normalized)[:5]
         elif question_id == 'name':
             # Title case for names
             normalized = normalized.title()
@@ -99,12 +142,11 @@ class ResponseService:
         
         # Question-specific validation
         if question_id == 'email':
-            if '@' not in raw_input or '.' not in raw_input:
+            if not _EMAIL_RE.match(raw_input):
                 return {'valid': False, 'error': 'Please enter a valid email address'}
         
         elif question_id == 'zip_code':
-            digits = ''.join(c for c in raw_input if c.isdigit())
-            if len(digits) < 5:
+            if len(_NON_DIGITS_RE.sub('', raw_input)) < 5:
                 return {'valid': False, 'error': 'Please enter a valid zip code'}
         
         elif question_id == 'name':
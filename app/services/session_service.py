@@ -10,7 +10,8 @@ from flask import current_app
 
 from app.models.user import User
 from app.models.chat_session import ChatSession, SessionStatus
-from app.models.user_response import UserResponse
+from app.services.request_cache import request_cache
+from app.services.response_service import ResponseService
 
 
 class SessionService:
@@ -22,7 +23,7 @@ class SessionService:
     @staticmethod
     def generate_session_seed() -> str:
         """Generate a unique seed for session randomization."""
-        return str(uuid.uuid4())
+        return uuid.uuid4().hex
     
     @classmethod
     def start_session(cls, email: str = None, name: str = None, 
@@ -54,40 +55,47 @@ class SessionService:
         session.save()
         
         # Get first question
-        questions = current_app.config['CHAT_QUESTIONS']
-        first_question = questions[0]
+        config = current_app.config
+        first_question = config['CHAT_QUESTIONS'][0]
         
         return {
             'session_id': str(session.id),
             'session_seed': session_seed,
             'status': session.status,
             'current_step': session.current_step,
-            'question': first_question,
-            'total_conjoint_rounds': current_app.config['CONJOINT_ROUNDS']
+            'question': dict(first_question),
+            'total_conjoint_rounds': config['CONJOINT_ROUNDS']
         }
     
     @classmethod
     def get_session(cls, session_id: str) -> Optional[ChatSession]:
-        """Get session by ID."""
-        return ChatSession.find_by_id(ObjectId(session_id))
+        """
+        Get session by ID, memoized for the rest of the request. Changes made
+        through the returned instance keep it current; writes that bypass it
+        drop the entry.
+        """
+        session_id = ObjectId(session_id)
+        cache = request_cache('_sessions')
+        
+        session = cache.get(session_id)
+        if session is None:
+            session = ChatSession.find_by_id(session_id)
+            if session:
+                cache[session_id] = session
+        return session
     
     @classmethod
     def get_session_state(cls, session_id: str) -> Dict[str, Any]:
         """
         Get complete session state including user info and responses.
         """
-        session = cls.get_session(session_id)
-        if not session:
+        # Session, linked user and responses in one round-trip
+        state = ChatSession.load_full_state(ObjectId(session_id))
+        if not state:
             return None
+        session, user, responses = state
         
-        # Get user info if linked
-        user = None
-        if session.user_id:
-            user = User.find_by_id(session.user_id)
-        
-        # Get all responses
-        responses = UserResponse.find_by_session(session.id)
-        response_map = {r.question_id: r.normalized_value for r in responses}
+        response_map = ResponseService.response_map_from_docs(responses)
         
         return {
             'session': session.to_json(),
@@ -106,26 +114,12 @@ class SessionService:
         if not session:
             raise ValueError("Session not found")
         
-        user, created = User.create_or_get(email=email, name=name, zip_code=zip_code)
-        
-        # Update user info if provided
-        if name and user.name != name:
-            user.collection.update_one(
-                {'_id': user.id},
-                {'$set': {'name': name}}
-            )
-            user.name = name
-        
-        if zip_code and user.zip_code != zip_code:
-            user.collection.update_one(
-                {'_id': user.id},
-                {'$set': {'zip_code': zip_code}}
-            )
-            user.zip_code = zip_code
+        # Create the user or update the info provided, in a single write
+        user, created = User.upsert_profile(email=email, name=name, zip_code=zip_code)
         
         # Link to session
         if session.user_id != user.id:
-            session.collection.update_one(
+            ChatSession.collection.update_one(
                 {'_id': session.id},
                 {'$set': {'user_id': user.id}}
             )
@@ -142,90 +136,86 @@ class SessionService:
         if not session:
             return None
         
-        questions = current_app.config['CHAT_QUESTIONS']
-        
         # Find current question
-        for question in questions:
-            if question['id'] == session.current_step:
-                return cls._format_question(session, question)
+        question = current_app.config['CHAT_QUESTION_BY_ID'].get(session.current_step)
+        if question is None:
+            return None
         
-        return None
+        return cls._format_question(session, question)
     
     @classmethod
     def advance_to_next_step(cls, session_id: str) -> Dict[str, Any]:
         """
         Advance session to the next question/step.
         """
-        session = cls.get_session(session_id)
+        config = current_app.config
+        question_ids = config['CHAT_QUESTION_IDS']
+        
+        # Stay in conjoint until all rounds are done, otherwise move to the
+        # next question (round 1 when entering conjoint); past the last
+        # question the session completes. Read and write in one atomic update.
+        session = ChatSession.advance(
+            session_id, question_ids, config['CONJOINT_ROUNDS']
+        )
         if not session:
             return None
+        request_cache('_sessions')[session.id] = session
+        
+        # Entering conjoint: round 1 is generated on demand by the next
+        # request, the remaining rounds in the background meanwhile
+        if session.current_step == 'conjoint' and session.current_round == 1:
+            from app.services.conjoint_service import ConjointService
+            ConjointService.schedule_pregeneration(
+                session.id, session.session_seed, first_round=2
+            )
         
-        questions = current_app.config['CHAT_QUESTIONS']
-        question_ids = [q['id'] for q in questions]
-        
-        current_idx = question_ids.index(session.current_step)
-        
-        # Check if we're in conjoint mode and NOT complete
-        if session.current_step == 'conjoint':
-            total_rounds = current_app.config['CONJOINT_ROUNDS']
-            # Only stay in conjoint if we haven't completed all rounds
-            if session.current_round < total_rounds:
-                # Continue conjoint rounds
-                session.update_progress('conjoint', session.current_round + 1)
-                return cls.get_current_question(session_id)
-            # If current_round >= total_rounds, fall through to move to next step
-        
-        # Move to next question
-        if current_idx < len(questions) - 1:
-            next_question = questions[current_idx + 1]
-            # Reset round to 1 only if entering conjoint, otherwise keep 0
-            new_round = 1 if next_question['id'] == 'conjoint' else 0
-            session.update_progress(next_question['id'], new_round)
-            return cls._format_question(session, next_question)
-        else:
+        if session.status == SessionStatus.COMPLETED and session.current_step == question_ids[-1]:
             # Session complete
-            session.complete()
             return {
                 'complete': True,
                 'message': 'Session completed successfully'
             }
+        
+        question = config['CHAT_QUESTION_BY_ID'][session.current_step]
+        return cls._format_question(session, question)
     
     @classmethod
     def _format_question(cls, session: ChatSession, question: Dict) -> Dict[str, Any]:
         """Format question with user data interpolation."""
+        config = current_app.config
         result = question.copy()
         
-        # Get branding data
-        branding_data = {
-            'assistant_name': current_app.config.get('ASSISTANT_NAME', 'Jill'),
-            'company_name': current_app.config.get('COMPANY_NAME', 'Veda-')
-        }
-        
-        # Get user data for interpolation
-        user_data = {}
-        if session.user_id:
-            user = User.find_by_id(session.user_id)
-            if user:
-                user_data['name'] = user.name or 'there'
-        
-        # Get responses for interpolation
-        responses = UserResponse.find_by_session(session.id)
-        for r in responses:
-            user_data[r.question_id] = r.normalized_value
-        
-        # Merge all interpolation data
-        interpolation_data = {**branding_data, **user_data}
-        
-        # Interpolate message
-        try:
-            result['message'] = question['message'].format(**interpolation_data)
-        except KeyError:
-            pass  # Keep original message if interpolation fails
+        # Messages without placeholders are sent as-is, with no data lookups
+        if '{' in question['message']:
+            # Get branding data
+            branding_data = {
+                'assistant_name': config.get('ASSISTANT_NAME', 'Jill'),
+                'company_name': config.get('COMPANY_NAME', 'Veda-')
+            }
+            
+            # Get responses for interpolation
+            user_data = dict(ResponseService.get_response_map(session.id))
+            
+            # An answered name question wins over the user record, so the
+            # user is only read when the name is still missing
+            if 'name' not in user_data and session.user_id:
+                user = User.find_by_id(session.user_id)
+                if user:
+                    user_data['name'] = user.name or 'there'
+            
+            # Merge all interpolation data
+            interpolation_data = {**branding_data, **user_data}
+            
+            # Interpolate message
+            try:
+                result['message'] = question['message'].format_map(interpolation_data)
+            except KeyError:
+                pass  # Keep original message if interpolation fails
         
         # Add session context
         result['session_id'] = str(session.id)
         result['current_round'] = session.current_round
-        result['total_rounds'] = current_app.config['CONJOINT_ROUNDS']
+        result['total_rounds'] = config['CONJOINT_ROUNDS']
         
         return result
     
@@ -242,3 +232,6 @@ class SessionService:
         session = cls.get_session(session_id)
         if session:
             session.abandon()
+            # Its rounds will not be requested again
+            from app.services.conjoint_service import ConjointService
+            ConjointService.invalidate_round_cache(session.id)
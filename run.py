@@ -7,6 +7,36 @@ from app import create_app
 
 app = create_app()
 
+# Same server settings as the Procfile/Dockerfile deploy commands; threads
+# let requests blocked on MongoDB overlap instead of queueing
+GUNICORN_OPTIONS = {
+    'workers': 2,
+    'worker_class': 'gthread',
+    'threads': 16,
+    'timeout': 120
+}
+
+
+def serve(host: str, port: int):
+    """Serve the app with gunicorn (threaded workers) outside debug mode."""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        # gunicorn is POSIX-only; fall back to the threaded Werkzeug server
+        app.run(host=host, port=port, threaded=True)
+        return
+    
+    class StandaloneApplication(BaseApplication):
+        def load_config(self):
+            for key, value in {**GUNICORN_OPTIONS, 'bind': f'{host}:{port}'}.items():
+                self.cfg.set(key, value)
+        
+        def load(self):
+            return app
+    
+    StandaloneApplication().run()
+
+
 if __name__ == '__main__':
     # Use PORT from environment (Railway sets this) or default to 5001
     port = int(os.environ.get('PORT', 5001))
@@ -20,4 +50,7 @@ if __name__ == '__main__':
     print(f"🔧 Debug Mode:     {debug}")
     print("\n" + "="*60 + "\n")
     
-    app.run(debug=debug, host='0.0.0.0', port=port)
+    if debug:
+        app.run(debug=True, host='0.0.0.0', port=port, threaded=True)
+    else:
+        serve('0.0.0.0', port)
@@ -321,11 +321,14 @@ class ChatApp {
         this.totalRoundsEl.textContent = data.total_rounds;
         this.totalRounds = data.total_rounds;
 
-        // Populate Card A
-        this.cardAContent.innerHTML = this.renderCardAttributes(data.card_a.attributes);
+        // Populate Card A (server-rendered markup; cards stored before it
+        // existed are rendered here)
+        this.cardAContent.innerHTML = data.card_a.rendered_html ||
+            this.renderCardAttributes(data.card_a.attributes);
 
         // Populate Card B
-        this.cardBContent.innerHTML = this.renderCardAttributes(data.card_b.attributes);
+        this.cardBContent.innerHTML = data.card_b.rendered_html ||
+            this.renderCardAttributes(data.card_b.attributes);
 
         // Show the job cards overlay (full screen, scrollable)
         this.jobCardsOverlay.classList.remove('hidden');